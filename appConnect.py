@@ -9,28 +9,76 @@
 # App-specific functions for u-preview.
 
 
+import importlib
 import os
 
+import environment
+import sequence
 
-# Detect environment and import approprate modules
-try:
-	import maya.cmds as mc
-	#os.environ['PREVIEW_APPCONNECT'] = 'maya'
-except ImportError:
-	pass
 
-try:
-	import hou
-	#os.environ['PREVIEW_APPCONNECT'] = 'houdini'
-except ImportError:
-	pass
+# ----------------------------------------------------------------------------
+# Backend registry
+# ----------------------------------------------------------------------------
+
+# Backend modules for each application, imported only when first used
+BACKENDS = {
+	'maya': 'appConnect_maya', 
+	'null': 'appConnect_null', 
+}
+
+# Backend to use in each host application if PREVIEW_APPCONNECT isn't set
+ENVIRONMENT_BACKENDS = {
+	'MAYA': 'maya', 
+}
+
+_backend_dict = {}
+
 
-try:
-	import nuke
-	import nukescripts
-	#os.environ['PREVIEW_APPCONNECT'] = 'nuke'
-except ImportError:
-	pass
+def registerBackend(name, module):
+	""" Register a backend module by name. The module is imported the first
+		time the backend is used, and must provide the same functions as
+		appConnect_null.
+	"""
+	BACKENDS[name] = module
+	_backend_dict.pop(name, None)
+
+
+def getBackendName():
+	""" Returns the name of the backend for the current application. The
+		PREVIEW_APPCONNECT environment variable takes precedence, otherwise
+		the backend is chosen from the detected host application. The
+		simulated backend is only used if it's selected explicitly, so an
+		unsupported application raises RuntimeError rather than showing a
+		simulated scene.
+	"""
+	name = os.environ.get('PREVIEW_APPCONNECT')
+	if not name:
+		env = environment.getEnvironment()
+		try:
+			name = ENVIRONMENT_BACKENDS[env]
+		except KeyError:
+			raise RuntimeError("No preview backend for %s. Set PREVIEW_APPCONNECT to choose one, e.g. 'null' for the simulated backend." %env)
+	return name
+
+
+def getBackend(name=None):
+	""" Returns the backend module with the given name, or the backend for
+		the current application, importing it if necessary.
+	"""
+	if name is None:
+		name = getBackendName()
+	try:
+		return _backend_dict[name]
+	except KeyError:
+		pass
+
+	try:
+		moduleName = BACKENDS[name]
+	except KeyError:
+		raise ValueError("Unknown preview backend: %s" %name)
+	backend = importlib.import_module(moduleName)
+	_backend_dict[name] = backend
+	return backend
 
 
 # ----------------------------------------------------------------------------
@@ -42,7 +90,7 @@ class AppConnect(object):
 	""" Connects u-preview to the relevant application and passes args to its
 		internal preview API.
 	"""
-	def __init__(self, fileInput, format, activeView, camera, res, frRange, offscreen, noSelect, guides, burnin, interruptible):
+	def __init__(self, fileInput, format, activeView, camera, res, frRange, offscreen, noSelect, guides, burnin, interruptible, processes=1, resume=False, incremental=False, cameras=None, burninMode='hud', viewportProfile="Current settings", frameStep=1, frameList=None, resizeOutputs=None, captureBackend='playblast', memoryLimit=0, background=False, headless=False, outputDir=None):
 	#def __init__(self, **kwargs):
 		self.fileInput = fileInput
 		self.outputFile = os.path.split(self.fileInput)[1]
@@ -61,135 +109,151 @@ class AppConnect(object):
 		self.guides = guides
 		self.burnin = burnin
 		self.interruptible = interruptible
+		self.processes = processes
+		self.resume = resume
+		self.incremental = incremental
+		self.cameras = cameras
+		self.burninMode = burninMode
+		self.viewportProfile = viewportProfile
+		self.frameStep = frameStep
+
+		self.resizeOutputs = resizeOutputs
+		self.captureBackend = captureBackend
+		self.memoryLimit = memoryLimit
+		self.background = background
+		self.headless = headless
+		self.outputDir = outputDir
+
+		# Frame list expressions override the frame range
+		self.frameList = None
+		if frameList:
+			self.frameList = sequence.parseFrameList(frameList)
+			self.frRange = self.range = (self.frameList[0], self.frameList[-1])
 
 
 	def appPreview(self):
-		""" Detect environment & begin preview.
+		""" Detect environment & begin preview. Returns a PlayblastResult.
+		"""
+		return self.createPreview().playblast_()
+
+
+	def createPreview(self):
+		""" Returns the application's preview object for the options, ready
+			to playblast. The output is written to a directory named after
+			the file in the project's playblasts directory, or in 'outputDir'
+			if it was given.
 		"""
-		#if os.environ['IC_ENV'] == 'MAYA':
-		if os.environ['PREVIEW_APPCONNECT'] == 'maya':
-			self.outputDir = os.path.join(mc.workspace(q=True, active=True), 'playblasts', self.fileInput)
-			import u_preview2_maya
-			previewSetup = u_preview2_maya.Preview(self.outputDir, 
-			                                       self.outputFile, 
-			                                       self.format, 
-			                                       self.activeView, 
-			                                       self.camera, 
-			                                       (self.hres, self.vres), 
-			                                       self.frRange, 
-			                                       self.offscreen, 
-			                                       self.noSelect, 
-			                                       self.guides, 
-			                                       self.burnin, 
-			                                       self.interruptible)
-			return previewSetup.playblast_()
+		backend = getBackend()
+		if self.outputDir:
+			outputDir = os.path.join(self.outputDir, self.fileInput)
+		else:
+			outputDir = backend.getOutputDir(self.fileInput)
+		return backend.createPreview(outputDir, 
+		                             self.outputFile, 
+		                             self.format, 
+		                             self.activeView, 
+		                             self.camera, 
+		                             (self.hres, self.vres), 
+		                             self.frRange, 
+		                             self.offscreen, 
+		                             self.noSelect, 
+		                             self.guides, 
+		                             self.burnin, 
+		                             self.interruptible, 
+		                             processes=self.processes, 
+		                             resume=self.resume, 
+		                             incremental=self.incremental, 
+		                             cameras=self.cameras, 
+		                             burninMode=self.burninMode, 
+		                             viewportProfile=self.viewportProfile, 
+		                             frameStep=self.frameStep, 
+		                             frameList=self.frameList, 
+		                             resizeOutputs=self.resizeOutputs, 
+		                             captureBackend=self.captureBackend, 
+		                             memoryLimit=self.memoryLimit, 
+		                             background=self.background, 
+		                             headless=self.headless)
 
 # ----------------------------------------------------------------------------
 # End of main class
+# ============================================================================
+# Scene queries
 # ----------------------------------------------------------------------------
 
-
 def getScene(fullPath=False):
 	""" Returns name of scene/script/project file.
 		fullPath : returns full path to scene file.
 	"""
-	#if os.environ['IC_ENV'] == 'MAYA':
-	if os.environ['PREVIEW_APPCONNECT'] == 'maya':
-		scene = mc.file(q=True, sceneName=True)
-
-		if fullPath:
-			return scene
-		else:
-			sceneName = os.path.splitext(os.path.basename(scene))[0]
+	return getBackend().getScene(fullPath)
 
-			if sceneName:
-				return sceneName
-			else:
-				return "untitled"
 
-
-def getCameras(renderableOnly=False):
+def getCameras(renderableOnly=False, namespace=None, referenced=None):
 	""" Returns list of cameras in the scene. Renderable cameras will be
 		listed first.
+		namespace  : only list cameras in this namespace or its children.
+		referenced : if True, only list referenced cameras, if False, only
+		             list cameras which aren't referenced.
 	"""
-	camera_list = []
-
-	#if os.environ['IC_ENV'] == 'MAYA':
-	if os.environ['PREVIEW_APPCONNECT'] == 'maya':
-		# noSelectText = ""
-		# camera_list = [noSelectText, ]
-		#camera_list = []
-		# cameras = mc.ls(cameras=True)
-		persp_cameras = mc.listCameras(perspective=True)
-		ortho_cameras = mc.listCameras(orthographic=True)
-		cameras = persp_cameras+ortho_cameras
-		for camera in cameras:
-			if mc.getAttr(camera+'.renderable'):
-				camera_list.insert(0, camera)
-			elif renderableOnly == False:
-				camera_list.append(camera)
-
-	return camera_list
+	return getBackend().getCameras(renderableOnly, namespace, referenced)
+
+
+def getCameraNamespaces():
+	""" Returns a sorted list of the namespaces containing cameras.
+	"""
+	return getBackend().getCameraNamespaces()
 
 
 def getActiveCamera(panel):
 	""" Returns camera for the specified panel.
 	"""
-	#if os.environ['IC_ENV'] == 'MAYA':
-	if os.environ['PREVIEW_APPCONNECT'] == 'maya':
-		try:
-			camera = mc.modelPanel(panel, cam=True, q=True)
-		except:
-			camera = ""
-
-		return camera
+	return getBackend().getActiveCamera(panel)
 
 
 def getActiveView():
 	""" Returns currently active panel. If panel has no camera attached,
 		return False.
 	"""
-	#if os.environ['IC_ENV'] == 'MAYA':
-	if os.environ['PREVIEW_APPCONNECT'] == 'maya':
-		panel = mc.getPanel(withFocus=True)
-		camera = getActiveCamera(panel)
-
-		if camera is not "":
-			return panel
-		else:
-			return False
+	return getBackend().getActiveView()
 
 
 def getResolution():
 	""" Returns the current resolution of scene/script/project file as a
 		tuple (integer, integer).
 	"""
-	#if os.environ['IC_ENV'] == 'MAYA':
-	if os.environ['PREVIEW_APPCONNECT'] == 'maya':
-		width = mc.getAttr("defaultResolution.w")
-		height = mc.getAttr("defaultResolution.h")
-
-		return width, height
+	return getBackend().getResolution()
 
 
 def getFrameRange():
 	""" Returns the frame range of scene/script/project file as a tuple
 		(integer, integer).
 	"""
-	#if os.environ['IC_ENV'] == 'MAYA':
-	if os.environ['PREVIEW_APPCONNECT'] == 'maya':
-		start = int(mc.playbackOptions(min=True, q=True))
-		end = int(mc.playbackOptions(max=True, q=True))
-
-		return start, end
+	return getBackend().getFrameRange()
 
 
 def getCurrentFrame():
 	""" Returns the current frame of scene/script/project file as an integer.
 	"""
-	#if os.environ['IC_ENV'] == 'MAYA':
-	if os.environ['PREVIEW_APPCONNECT'] == 'maya':
-		frame = int(mc.currentTime(q=True))
+	return getBackend().getCurrentFrame()
 
-		return frame
 
+def getPlayblastsDir():
+	""" Returns the directory the playblasts are written to by default.
+	"""
+	return getBackend().getPlayblastsDir()
+
+
+def getCacheStats():
+	""" Returns the backend's query cache hit and miss counts as a
+		dictionary.
+	"""
+	return getBackend().getCacheStats()
+
+
+def invalidateCache():
+	""" Discards all cached query results.
+	"""
+	getBackend().invalidateCache()
+
+# ----------------------------------------------------------------------------
+# End of scene queries
+# ----------------------------------------------------------------------------
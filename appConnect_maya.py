@@ -0,0 +1,423 @@
+#!/usr/bin/python
+
+# appConnect_maya.py
+#
+# Mike Bonnington <mjbonnington@gmail.com>
+# (c) 2019
+#
+# Maya backend for u-preview.
+# Scene queries and playblasts for Maya. This module is only imported by
+# appConnect when running in Maya. Query results are cached until Maya
+# reports a change to the scene.
+
+
+import functools
+import os
+
+import maya.cmds as mc
+import maya.api.OpenMaya as om
+
+
+# ----------------------------------------------------------------------------
+# Query cache class
+# ----------------------------------------------------------------------------
+
+class QueryCache(object):
+	""" Cache the results of scene queries until the scene changes.
+		Each entry belongs to a group, e.g. 'cameras' or 'resolution', and
+		callbacks registered with the application invalidate the affected
+		groups when the scene is opened or saved, cameras are added,
+		removed or renamed, or the attributes the queries depend on change.
+		If the callbacks can't be registered, every call goes straight
+		through to the application. Hits and misses are counted.
+	"""
+	# Groups invalidated by each kind of change
+	SCENE_GROUPS = ('scene', 'cameras', 'activeCamera', 'resolution', 'frameRange')
+	CAMERA_GROUPS = ('cameras', 'activeCamera')
+
+	def __init__(self):
+		self.entries = {}
+		self.hits = 0
+		self.misses = 0
+		self.installed = False
+		self.enabled = False
+		self.callbackIds = []
+		self.nodeCallback_dict = {}  # Per-node callbacks, keyed by MObject handle hash
+
+
+	def get(self, group, key, func, args, kwargs):
+		""" Return the cached result for the key, calling the function to
+			get it if it isn't cached.
+		"""
+		if not self.installed:
+			self.install()
+		if not self.enabled:
+			return func(*args, **kwargs)
+
+		try:
+			value = self.entries[group][key]
+			self.hits += 1
+		except KeyError:
+			value = func(*args, **kwargs)
+			self.entries.setdefault(group, {})[key] = value
+			self.misses += 1
+
+		if isinstance(value, list):  # Don't let callers modify the cache
+			return list(value)
+		return value
+
+
+	def invalidate(self, *groups):
+		""" Discard the cached results for the given groups, or all results
+			if no groups are given.
+		"""
+		if not groups:
+			self.entries = {}
+		for group in groups:
+			self.entries.pop(group, None)
+
+
+	def stats(self):
+		""" Return a dictionary of the cache's hit and miss counts.
+		"""
+		stats = {}
+		stats['hits'] = self.hits
+		stats['misses'] = self.misses
+		stats['entries'] = sum(len(entries) for entries in self.entries.values())
+		return stats
+
+
+	def install(self):
+		""" Register the application callbacks which invalidate the cache.
+		"""
+		self.installed = True
+		try:
+			invalidateScene = lambda *args: self.resetScene()
+			for msg in (om.MSceneMessage.kAfterOpen, 
+			            om.MSceneMessage.kAfterNew, 
+			            om.MSceneMessage.kAfterImport, 
+			            om.MSceneMessage.kAfterLoadReference, 
+			            om.MSceneMessage.kAfterUnloadReference, 
+			            om.MSceneMessage.kAfterCreateReference, 
+			            om.MSceneMessage.kAfterRemoveReference):
+				self.callbackIds.append(om.MSceneMessage.addCallback(msg, invalidateScene))
+			self.callbackIds.append(om.MSceneMessage.addCallback(om.MSceneMessage.kAfterSave, lambda *args: self.invalidate('scene')))
+
+			invalidateCameras = lambda *args: self.invalidate(*self.CAMERA_GROUPS)
+			self.callbackIds.append(om.MDGMessage.addNodeAddedCallback(invalidateCameras, 'camera'))
+			self.callbackIds.append(om.MDGMessage.addNodeRemovedCallback(self.cameraRemoved, 'camera'))
+			self.callbackIds.append(om.MNodeMessage.addNameChangedCallback(om.MObject(), self.nodeRenamed))
+			self.callbackIds.append(om.MEventMessage.addEventCallback('cameraChange', lambda *args: self.invalidate('activeCamera')))
+			self.callbackIds.append(om.MEventMessage.addEventCallback('playbackRangeChanged', lambda *args: self.invalidate('frameRange')))
+			self.watchAttributes('defaultResolution', ('width', 'height'), ('resolution', ))
+		except (AttributeError, RuntimeError):
+			self.uninstall()
+			return
+
+		self.enabled = True
+
+
+	def uninstall(self):
+		""" Remove all the callbacks and disable the cache.
+		"""
+		for callbackId in self.callbackIds + list(self.nodeCallback_dict.values()):
+			try:
+				om.MMessage.removeCallback(callbackId)
+			except RuntimeError:
+				pass
+		self.callbackIds = []
+		self.nodeCallback_dict = {}
+		self.entries = {}
+		self.enabled = False
+
+
+	def resetScene(self):
+		""" Invalidate everything when a different scene is loaded. The
+			callbacks on individual nodes are re-registered as needed.
+		"""
+		for callbackId in self.nodeCallback_dict.values():
+			try:
+				om.MMessage.removeCallback(callbackId)
+			except RuntimeError:
+				pass
+		self.nodeCallback_dict = {}
+		self.invalidate()
+		try:
+			self.watchAttributes('defaultResolution', ('width', 'height'), ('resolution', ))
+		except RuntimeError:
+			pass
+
+
+	def cameraRemoved(self, node, *args):
+		""" Invalidate the camera queries when a camera is deleted, and stop
+			watching its attributes.
+		"""
+		self.invalidate(*self.CAMERA_GROUPS)
+		self.unwatch(node)
+
+
+	def nodeRenamed(self, node, prevName, *args):
+		""" Invalidate the camera queries when a camera is renamed. Cameras
+			are listed by their transforms, so renaming either the transform
+			or the shape counts.
+		"""
+		if node.hasFn(om.MFn.kCamera):
+			self.invalidate(*self.CAMERA_GROUPS)
+		elif node.hasFn(om.MFn.kTransform):
+			dagFn = om.MFnDagNode(node)
+			for i in range(dagFn.childCount()):
+				if dagFn.child(i).hasFn(om.MFn.kCamera):
+					self.invalidate(*self.CAMERA_GROUPS)
+					break
+
+
+	def watchAttributes(self, node, attr_ls, groups, mObject=None):
+		""" Invalidate the given groups when any of the listed attributes of
+			a node are set. Each node is only watched once. Nodes are
+			identified by their MObjects rather than their names, so a new
+			node with the name of a deleted one is watched too. If the node's
+			MObject is given, the name isn't looked up.
+		"""
+		if not self.callbackIds:
+			return
+
+		if mObject is None:
+			selection = om.MSelectionList()
+			selection.add(node)
+			try:  # Watch the shape node of a transform, e.g. a camera
+				dagPath = selection.getDagPath(0)
+				dagPath.extendToShape()
+				mObject = dagPath.node()
+			except (TypeError, RuntimeError):
+				mObject = selection.getDependNode(0)
+		key = om.MObjectHandle(mObject).hashCode()
+		if key in self.nodeCallback_dict:
+			return
+
+		def attributeChanged(msg, plug, otherPlug, *args):
+			if msg & om.MNodeMessage.kAttributeSet and plug.partialName(useLongNames=True) in attr_ls:
+				self.invalidate(*groups)
+
+		self.nodeCallback_dict[key] = om.MNodeMessage.addAttributeChangedCallback(mObject, attributeChanged)
+
+
+	def unwatch(self, mObject):
+		""" Remove the attribute callback for a node, e.g. when it's deleted.
+		"""
+		callbackId = self.nodeCallback_dict.pop(om.MObjectHandle(mObject).hashCode(), None)
+		if callbackId is not None:
+			try:
+				om.MMessage.removeCallback(callbackId)
+			except RuntimeError:
+				pass
+
+# ----------------------------------------------------------------------------
+# End of query cache class
+# ----------------------------------------------------------------------------
+
+
+_cache = QueryCache()
+
+
+def cached(group):
+	""" Decorator to cache the results of a query function in the given
+		group of the query cache.
+	"""
+	def decorator(func):
+		@functools.wraps(func)
+		def wrapper(*args, **kwargs):
+			key = (func.__name__, args, tuple(sorted(kwargs.items())))
+			return _cache.get(group, key, func, args, kwargs)
+		return wrapper
+	return decorator
+
+
+def getCacheStats():
+	""" Returns the query cache's hit and miss counts as a dictionary.
+	"""
+	return _cache.stats()
+
+
+def invalidateCache():
+	""" Discards all cached query results.
+	"""
+	_cache.invalidate()
+
+
+# ----------------------------------------------------------------------------
+# Scene queries
+# ----------------------------------------------------------------------------
+
+@cached('scene')
+def getScene(fullPath=False):
+	""" Returns name of scene/script/project file.
+		fullPath : returns full path to scene file.
+	"""
+	scene = mc.file(q=True, sceneName=True)
+
+	if fullPath:
+		return scene
+	else:
+		sceneName = os.path.splitext(os.path.basename(scene))[0]
+
+		if sceneName:
+			return sceneName
+		else:
+			return "untitled"
+
+
+@cached('cameras')
+def getCameras(renderableOnly=False, namespace=None, referenced=None):
+	""" Returns list of cameras in the scene. Renderable cameras will be
+		listed first, perspective cameras before orthographic ones.
+		namespace  : only list cameras in this namespace or its children.
+		referenced : if True, only list referenced cameras, if False, only
+		             list cameras which aren't referenced.
+	"""
+	camera_list = []
+
+	# Partition the cameras in a single pass over the DAG, reading the
+	# attributes through the API rather than querying each camera
+	renderable_ls = ([], [])  # (perspective, orthographic)
+	other_ls = ([], [])
+	visited = set()
+
+	dagIter = om.MItDag(om.MItDag.kDepthFirst, om.MFn.kCamera)
+	while not dagIter.isDone():
+		dagPath = dagIter.getPath()
+		dagIter.next()
+
+		cameraFn = om.MFnCamera(dagPath)
+		if cameraFn.isIntermediateObject:
+			continue
+		shape = dagPath.node()
+		dagPath.pop()  # Cameras are listed by their transforms
+		camera = dagPath.partialPathName()
+		if camera in visited:  # Instanced
+			continue
+		visited.add(camera)
+
+		if not cameraMatches(camera, cameraFn, namespace, referenced):
+			continue
+
+		_cache.watchAttributes(camera, ('renderable', ), ('cameras', ), shape)
+		ortho = 1 if cameraFn.isOrtho() else 0
+		if cameraFn.findPlug('renderable', False).asBool():
+			renderable_ls[ortho].append(camera)
+		elif renderableOnly == False:
+			other_ls[ortho].append(camera)
+
+	camera_list = renderable_ls[0] + renderable_ls[1] + other_ls[0] + other_ls[1]
+
+	return camera_list
+
+
+def cameraMatches(camera, cameraFn, namespace=None, referenced=None):
+	""" Returns True if the camera passes the namespace and reference
+		filters given to getCameras().
+	"""
+	if namespace is not None:
+		cameraNamespace = getNamespace(camera)
+		namespace = namespace.strip(':')
+		if not (cameraNamespace == namespace or cameraNamespace.startswith(namespace+':')):
+			return False
+	if referenced is not None:
+		if bool(cameraFn.isFromReferencedFile) != referenced:
+			return False
+	return True
+
+
+def getNamespace(node):
+	""" Returns the namespace of a node name or path, without leading or
+		trailing colons. Nodes in the root namespace return an empty string.
+	"""
+	return node.split('|')[-1].rpartition(':')[0].strip(':')
+
+
+@cached('cameras')
+def getCameraNamespaces():
+	""" Returns a sorted list of the namespaces containing cameras.
+	"""
+	namespaces = set(getNamespace(camera) for camera in getCameras())
+	namespaces.discard("")
+	return sorted(namespaces)
+
+
+@cached('activeCamera')
+def getActiveCamera(panel):
+	""" Returns camera for the specified panel.
+	"""
+	try:
+		camera = mc.modelPanel(panel, cam=True, q=True)
+	except:
+		camera = ""
+
+	return camera
+
+
+def getActiveView():
+	""" Returns currently active panel. If panel has no camera attached,
+		return False.
+	"""
+	panel = mc.getPanel(withFocus=True)
+	camera = getActiveCamera(panel)
+
+	if camera != "":
+		return panel
+	else:
+		return False
+
+
+@cached('resolution')
+def getResolution():
+	""" Returns the current resolution of scene/script/project file as a
+		tuple (integer, integer).
+	"""
+	width = mc.getAttr("defaultResolution.w")
+	height = mc.getAttr("defaultResolution.h")
+
+	return width, height
+
+
+@cached('frameRange')
+def getFrameRange():
+	""" Returns the frame range of scene/script/project file as a tuple
+		(integer, integer).
+	"""
+	start = int(mc.playbackOptions(min=True, q=True))
+	end = int(mc.playbackOptions(max=True, q=True))
+
+	return start, end
+
+
+def getCurrentFrame():
+	""" Returns the current frame of scene/script/project file as an integer.
+	"""
+	frame = int(mc.currentTime(q=True))
+
+	return frame
+
+
+# ----------------------------------------------------------------------------
+# Playblast
+# ----------------------------------------------------------------------------
+
+def getPlayblastsDir():
+	""" Returns the current project's playblasts directory.
+	"""
+	return os.path.join(mc.workspace(q=True, active=True), 'playblasts')
+
+
+def getOutputDir(fileInput):
+	""" Returns the directory to write the playblast to, inside the current
+		project's playblasts directory.
+	"""
+	return os.path.join(getPlayblastsDir(), fileInput)
+
+
+def createPreview(*args, **kwargs):
+	""" Returns a Preview object for the given options. The arguments are
+		the same as for u_preview2_maya.Preview.
+	"""
+	import u_preview2_maya
+	return u_preview2_maya.Preview(*args, **kwargs)
@@ -0,0 +1,305 @@
+#!/usr/bin/python
+
+# appConnect_null.py
+#
+# Mike Bonnington <mjbonnington@gmail.com>
+# (c) 2019
+#
+# Simulated backend for u-preview.
+# Answers scene queries from an in-memory scene description and simulates
+# playblasts without an application, so the UI and the rest of the pipeline
+# can be tested and benchmarked anywhere. Select it by setting
+# PREVIEW_APPCONNECT to 'null'. The scene can be changed with setScene().
+
+
+import os
+import tempfile
+import time
+
+import sequence
+import timing
+from result import PlayblastResult
+
+
+# ----------------------------------------------------------------------------
+# Simulated scene
+# ----------------------------------------------------------------------------
+
+def defaultScene():
+	""" Returns a description of an empty scene, with Maya's default
+		cameras.
+	"""
+	scene = {}
+	scene['path'] = ""
+	scene['cameras'] = [  # (name, renderable, ortho, referenced)
+		('persp', True, False, False),
+		('top', False, True, False),
+		('front', False, True, False),
+		('side', False, True, False),
+	]
+	scene['panels'] = {'modelPanel4': 'persp'}
+	scene['activeView'] = 'modelPanel4'
+	scene['resolution'] = (1920, 1080)
+	scene['frameRange'] = (1001, 1100)
+	scene['currentFrame'] = 1001
+	scene['frameTime'] = 0.0  # Seconds to spend capturing each frame
+	return scene
+
+
+_scene = defaultScene()
+_queries = 0
+
+
+def setScene(**kwargs):
+	""" Update the simulated scene, e.g. setScene(frameRange=(1, 10)). With
+		no arguments the scene is reset to its defaults.
+	"""
+	global _scene
+	if not kwargs:
+		_scene = defaultScene()
+	for key, value in kwargs.items():
+		if key not in _scene:
+			raise KeyError("Unknown scene property: %s" %key)
+		_scene[key] = value
+
+
+def getCacheStats():
+	""" Returns the number of queries made. Nothing is cached, so every
+		query is a miss.
+	"""
+	stats = {}
+	stats['hits'] = 0
+	stats['misses'] = _queries
+	stats['entries'] = 0
+	return stats
+
+
+def invalidateCache():
+	""" Nothing is cached, so there's nothing to discard.
+	"""
+	pass
+
+
+def _query(key):
+	""" Returns a property of the simulated scene, counting the query.
+	"""
+	global _queries
+	_queries += 1
+	return _scene[key]
+
+# ----------------------------------------------------------------------------
+# End of simulated scene
+# ============================================================================
+# Scene queries
+# ----------------------------------------------------------------------------
+
+def getScene(fullPath=False):
+	""" Returns name of scene/script/project file.
+		fullPath : returns full path to scene file.
+	"""
+	scene = _query('path')
+
+	if fullPath:
+		return scene
+	else:
+		sceneName = os.path.splitext(os.path.basename(scene))[0]
+
+		if sceneName:
+			return sceneName
+		else:
+			return "untitled"
+
+
+def getCameras(renderableOnly=False, namespace=None, referenced=None):
+	""" Returns list of cameras in the scene. Renderable cameras will be
+		listed first, perspective cameras before orthographic ones.
+		namespace  : only list cameras in this namespace or its children.
+		referenced : if True, only list referenced cameras, if False, only
+		             list cameras which aren't referenced.
+	"""
+	renderable_ls = ([], [])  # (perspective, orthographic)
+	other_ls = ([], [])
+
+	for camera, renderable, ortho, isReferenced in _query('cameras'):
+		if namespace is not None:
+			cameraNamespace = getNamespace(camera)
+			namespace = namespace.strip(':')
+			if not (cameraNamespace == namespace or cameraNamespace.startswith(namespace+':')):
+				continue
+		if referenced is not None and isReferenced != referenced:
+			continue
+
+		if renderable:
+			renderable_ls[int(ortho)].append(camera)
+		elif renderableOnly == False:
+			other_ls[int(ortho)].append(camera)
+
+	return renderable_ls[0] + renderable_ls[1] + other_ls[0] + other_ls[1]
+
+
+def getNamespace(node):
+	""" Returns the namespace of a node name or path, without leading or
+		trailing colons. Nodes in the root namespace return an empty string.
+	"""
+	return node.split('|')[-1].rpartition(':')[0].strip(':')
+
+
+def getCameraNamespaces():
+	""" Returns a sorted list of the namespaces containing cameras.
+	"""
+	namespaces = set(getNamespace(camera) for camera in getCameras())
+	namespaces.discard("")
+	return sorted(namespaces)
+
+
+def getActiveCamera(panel):
+	""" Returns camera for the specified panel.
+	"""
+	return _query('panels').get(panel, "")
+
+
+def getActiveView():
+	""" Returns currently active panel. If panel has no camera attached,
+		return False.
+	"""
+	panel = _query('activeView')
+
+	if getActiveCamera(panel):
+		return panel
+	else:
+		return False
+
+
+def getResolution():
+	""" Returns the current resolution of scene/script/project file as a
+		tuple (integer, integer).
+	"""
+	return tuple(_query('resolution'))
+
+
+def getFrameRange():
+	""" Returns the frame range of scene/script/project file as a tuple
+		(integer, integer).
+	"""
+	return tuple(_query('frameRange'))
+
+
+def getCurrentFrame():
+	""" Returns the current frame of scene/script/project file as an integer.
+	"""
+	return _query('currentFrame')
+
+# ----------------------------------------------------------------------------
+# End of scene queries
+# ============================================================================
+# Simulated playblast class
+# ----------------------------------------------------------------------------
+
+class NullPreview(object):
+	""" Simulate a playblast. Each frame is timed as if it were captured,
+		taking the scene's 'frameTime' seconds, but nothing is written to
+		disk. Accepts the same arguments as u_preview2_maya.Preview and
+		returns results in the same form.
+	"""
+	def __init__(self, outputDir, outputFile, outputFormat, activeView,
+				 camera, res, frRange, offscreen, noSelect, guides, burnin,
+				 interruptible, frameStep=1, frameList=None, **kwargs):
+		self.playblastDir = outputDir
+		self.outputFile = outputFile
+		self.formatName = outputFormat
+		self.res = (int(res[0]), int(res[1]))
+		self.frRange = (int(frRange[0]), int(frRange[1]))
+		self.frameStep = max(1, int(frameStep))
+		self.frameList = None
+		if frameList:
+			self.frameList = sorted(set(int(frame) for frame in frameList))
+		self.frameTimer = None
+		self.timingReport = None
+		self.stageTimer = timing.StageTimer()
+		self.progress = None
+		self.chunkProgress = None
+		self.chunkSize = 10
+		self.cancelled = False
+		self.framesTotal = 0
+
+
+	def cancel(self):
+		""" Stop the simulated playblast at the end of the current chunk.
+		"""
+		self.cancelled = True
+
+
+	def getFrames(self):
+		""" Return the list of frames to simulate.
+		"""
+		if self.frameList:
+			return list(self.frameList)
+		return list(range(self.frRange[0], self.frRange[1]+1, self.frameStep))
+
+
+	def playblast_(self):
+		""" Simulate the playblast in chunks, reporting progress between
+			them like a real playblast. Returns a PlayblastResult.
+		"""
+		self.stageTimer.start('capture')
+		self.frameTimer = timing.FrameTimer()
+		self.frameTimer.start()
+		frameTime = _scene['frameTime']
+		frame_ls = self.getFrames()
+		self.framesTotal = len(frame_ls)
+		completed_ls = []
+		if self.chunkProgress:
+			self.chunkProgress(0, len(frame_ls))
+		for i in range(0, len(frame_ls), self.chunkSize):
+			if self.cancelled:
+				break
+			for frame in frame_ls[i:i+self.chunkSize]:
+				self.frameTimer.mark(frame)
+				if self.progress:
+					self.progress(frame)
+				if frameTime:
+					time.sleep(frameTime)
+				completed_ls.append(frame)
+			if self.chunkProgress:
+				self.chunkProgress(len(completed_ls), len(frame_ls))
+		self.frameTimer.finish()
+		self.timingReport = self.frameTimer.report()
+
+		if self.formatName == "QuickTime":
+			output = os.path.join(self.playblastDir, '%s.mov' %self.outputFile)
+		elif self.formatName == "MPEG-4 (ffmpeg)":
+			output = os.path.join(self.playblastDir, '%s.mp4' %self.outputFile)
+		elif self.formatName == "TIFF sequence":
+			output = sequence.sequencePath(self.playblastDir, self.outputFile, 'tif')
+		else:
+			output = sequence.sequencePath(self.playblastDir, self.outputFile, 'jpg')
+
+		return PlayblastResult("Interrupted" if len(completed_ls) < len(frame_ls) else "Completed", 
+		                       path=output, 
+		                       frames=completed_ls, 
+		                       timings=self.stageTimer.report(), 
+		                       timingReport=self.timingReport)
+
+# ----------------------------------------------------------------------------
+# End of simulated playblast class
+# ============================================================================
+# Playblast
+# ----------------------------------------------------------------------------
+
+def getPlayblastsDir():
+	""" Returns a temporary playblasts directory.
+	"""
+	return os.path.join(tempfile.gettempdir(), 'playblasts')
+
+
+def getOutputDir(fileInput):
+	""" Returns the directory to write the playblast to, inside a temporary
+		playblasts directory.
+	"""
+	return os.path.join(getPlayblastsDir(), fileInput)
+
+
+def createPreview(*args, **kwargs):
+	""" Returns a NullPreview object for the given options.
+	"""
+	return NullPreview(*args, **kwargs)
@@ -0,0 +1,183 @@
+#!/usr/bin/python
+
+# burnin.py
+#
+# Mike Bonnington <mjbonnington@gmail.com>
+# (c) 2019
+#
+# Burn-in compositor for u-preview.
+# Draws burn-in text onto captured frames as a post-process, in a pool of
+# worker threads, so no per-frame work happens on the application's main
+# thread during capture. The text layout mirrors the ten sections of Maya's
+# heads-up display. NumPy is used to darken the text bands if available.
+
+
+import sys
+
+from multiprocessing.pool import ThreadPool
+
+from Qt import QtCore, QtGui, QtWidgets
+
+try:
+	import numpy
+except ImportError:
+	numpy = None
+
+
+# ----------------------------------------------------------------------------
+# Configuration
+# ----------------------------------------------------------------------------
+
+# Horizontal anchor and alignment for the five sections in each row
+SECTION_ANCHORS = [
+	(0.0, QtCore.Qt.AlignLeft),
+	(0.25, QtCore.Qt.AlignHCenter),
+	(0.5, QtCore.Qt.AlignHCenter),
+	(0.75, QtCore.Qt.AlignHCenter),
+	(1.0, QtCore.Qt.AlignRight),
+]
+
+# Font sizes as a fraction of the image height
+FONT_SIZES = {'small': 0.022, 'large': 0.04}
+
+BAND_OPACITY = 0.5  # Darkening factor applied behind the text
+MARGIN = 0.01  # Margin around the text as a fraction of the image height
+
+# Keep a reference to any application instance we have to create
+_app = None
+
+
+def _ensureApplication():
+	""" Make sure a Qt application exists, as fonts can't be used without
+		one, e.g. when running headless under mayapy.
+	"""
+	global _app
+	if QtWidgets.QApplication.instance() is None:
+		_app = QtWidgets.QApplication(sys.argv)
+
+
+def _imageArray(image):
+	""" Return a writable NumPy view of a 32-bit QImage's pixels with shape
+		(height, width, 4), or None if a view can't be created.
+	"""
+	ptr = image.bits()
+	try:
+		ptr.setsize(image.byteCount())  # PyQt
+	except AttributeError:
+		pass
+	try:
+		array = numpy.frombuffer(ptr, numpy.uint8)
+	except (TypeError, ValueError):
+		return None
+	if not array.flags.writeable:
+		return None
+	array = array.reshape(image.height(), image.bytesPerLine() // 4, 4)
+	return array[:, :image.width()]
+
+
+# ----------------------------------------------------------------------------
+# Main class
+# ----------------------------------------------------------------------------
+
+class Burnin(object):
+	""" Composite burn-in text onto image files.
+		Each frame's text is given as a list of (section, text, size) tuples,
+		where 'section' is a HUD section number 0-9 (0-4 along the top, 5-9
+		along the bottom) and 'size' is 'small' or 'large'.
+	"""
+	def __init__(self, threads=None):
+		_ensureApplication()
+		self.threads = threads
+
+
+	def drawFrame(self, path, field_ls):
+		""" Draw the burn-in onto the image file at 'path', overwriting it.
+		"""
+		image = QtGui.QImage(path)
+		if image.isNull():
+			return False
+		hasAlpha = image.hasAlphaChannel()
+		image = image.convertToFormat(QtGui.QImage.Format_ARGB32 if hasAlpha else QtGui.QImage.Format_RGB32)
+
+		width, height = image.width(), image.height()
+		margin = int(height * MARGIN)
+
+		# Work out the height of the text in the top and bottom bands
+		top = [[] for section in range(5)]
+		bottom = [[] for section in range(5)]
+		for section, text, size in field_ls:
+			(top if section < 5 else bottom)[section % 5].append((str(text), size))
+
+		def blockHeight(block):
+			return sum(int(height * FONT_SIZES[size] * 1.4) for text, size in block)
+		topHeight = max(blockHeight(block) for block in top)
+		bottomHeight = max(blockHeight(block) for block in bottom)
+
+		# Darken bands behind the text
+		band_ls = []
+		if topHeight:
+			band_ls.append((0, topHeight + 2*margin))
+		if bottomHeight:
+			band_ls.append((height - bottomHeight - 2*margin, height))
+		self.darkenBands(image, band_ls)
+
+		# Draw text
+		painter = QtGui.QPainter(image)
+		painter.setRenderHint(QtGui.QPainter.TextAntialiasing)
+		painter.setPen(QtGui.QColor(255, 255, 255))
+		font = painter.font()
+		for row, blocks, rowHeight in ((0, top, topHeight), (1, bottom, bottomHeight)):
+			for section, block in enumerate(blocks):
+				anchor, align = SECTION_ANCHORS[section]
+				y = margin if row == 0 else height - margin - rowHeight
+				for text, size in block:
+					lineHeight = int(height * FONT_SIZES[size] * 1.4)
+					font.setPixelSize(int(height * FONT_SIZES[size]))
+					painter.setFont(font)
+					if align == QtCore.Qt.AlignLeft:
+						rect = QtCore.QRect(margin, y, width, lineHeight)
+					elif align == QtCore.Qt.AlignRight:
+						rect = QtCore.QRect(0, y, width - margin, lineHeight)
+					else:
+						rect = QtCore.QRect(int(width*anchor) - width//2, y, width, lineHeight)
+					painter.drawText(rect, align | QtCore.Qt.AlignVCenter, text)
+					y += lineHeight
+		painter.end()
+
+		return image.save(path, None, 95)
+
+
+	def darkenBands(self, image, band_ls):
+		""" Darken the given horizontal bands (y0, y1) of the image, leaving
+			any alpha channel untouched.
+		"""
+		array = _imageArray(image) if numpy is not None else None
+		if array is not None:
+			for y0, y1 in band_ls:
+				band = array[y0:y1, :, :3]
+				band[...] = (band * BAND_OPACITY).astype(numpy.uint8)
+		else:  # Fall back to painting a translucent rectangle
+			painter = QtGui.QPainter(image)
+			painter.setCompositionMode(QtGui.QPainter.CompositionMode_SourceAtop)
+			for y0, y1 in band_ls:
+				painter.fillRect(0, y0, image.width(), y1-y0, QtGui.QColor(0, 0, 0, int(255*BAND_OPACITY)))
+			painter.end()
+
+
+	def process(self, item_ls):
+		""" Draw the burn-in onto a list of frames in parallel. Each item in
+			the list is a tuple (path, field_ls). Returns the number of frames
+			which could not be processed.
+		"""
+		pool = ThreadPool(self.threads)
+		try:
+			result_ls = pool.map(lambda item: self.drawFrame(*item), item_ls)
+		finally:
+			pool.close()
+			pool.join()
+
+		return result_ls.count(False)
+
+# ----------------------------------------------------------------------------
+# End of main class
+# ----------------------------------------------------------------------------
@@ -0,0 +1,147 @@
+#!/usr/bin/python
+
+# encoder.py
+#
+# Mike Bonnington <mjbonnington@gmail.com>
+# (c) 2019
+#
+# Streaming movie encoder for u-preview.
+# Frames are piped to an ffmpeg subprocess while they are being captured, so
+# encoding overlaps with capture and no intermediate image sequence needs to
+# be kept. This module has no application-specific dependencies.
+
+
+import os
+import subprocess
+import sys
+import tempfile
+import threading
+
+try:
+	import queue
+except ImportError:  # Python 2
+	import Queue as queue
+
+
+# ----------------------------------------------------------------------------
+# Configuration
+# ----------------------------------------------------------------------------
+
+# Video encoding arguments. The scale filter ensures even dimensions, which
+# are required for yuv420p output.
+VIDEO_ARGS = ['-c:v', 'libx264', '-preset', 'fast', '-crf', '18',
+              '-pix_fmt', 'yuv420p', '-vf', 'scale=trunc(iw/2)*2:trunc(ih/2)*2']
+AUDIO_ARGS = ['-c:a', 'aac', '-b:a', '192k']
+
+
+def findEncoder():
+	""" Return the path to the ffmpeg executable, or None if it can't be
+		found. The PREVIEW_FFMPEG environment variable takes precedence over
+		searching the PATH.
+	"""
+	try:
+		return os.environ['PREVIEW_FFMPEG']
+	except KeyError:
+		pass
+
+	exe = "ffmpeg.exe" if sys.platform == 'win32' else "ffmpeg"
+	for folder in os.environ.get('PATH', "").split(os.pathsep):
+		path = os.path.join(folder, exe)
+		if os.path.isfile(path) and os.access(path, os.X_OK):
+			return path
+
+	return None
+
+
+# ----------------------------------------------------------------------------
+# Main class
+# ----------------------------------------------------------------------------
+
+class StreamEncoder(object):
+	""" Encode a movie from image files as they are added. A feeder thread
+		reads each frame and writes it to the encoder's stdin, so the caller
+		never waits on encoding unless the queue of pending frames is full.
+		Audio, if specified, is muxed in the same pass.
+	"""
+	def __init__(self, outputPath, fps, audio=None, audioOffset=0.0,
+	             executable=None, maxQueued=32):
+		if executable is None:
+			executable = findEncoder()
+
+		cmd = [executable, '-y', '-loglevel', 'error',
+		       '-f', 'image2pipe', '-framerate', str(fps), '-i', '-']
+		if audio:
+			# A positive offset delays the audio, a negative one skips into it
+			if audioOffset >= 0:
+				cmd += ['-itsoffset', str(audioOffset), '-i', audio]
+			else:
+				cmd += ['-ss', str(-audioOffset), '-i', audio]
+			cmd += ['-map', '0:v', '-map', '1:a'] + AUDIO_ARGS + ['-shortest']
+		cmd += VIDEO_ARGS + [outputPath]
+
+		self.outputPath = outputPath
+		self.error = None
+		self.stderr = tempfile.TemporaryFile()
+		self.proc = subprocess.Popen(cmd, stdin=subprocess.PIPE, stderr=self.stderr)
+
+		self.queue = queue.Queue(maxsize=maxQueued)
+		self.thread = threading.Thread(target=self.feed)
+		self.thread.daemon = True
+		self.thread.start()
+
+
+	def feed(self):
+		""" Write queued frames to the encoder until the end of the stream.
+			If the encoder fails, carry on draining the queue so the caller
+			doesn't block.
+		"""
+		while True:
+			item = self.queue.get()
+			if item is None:
+				break
+			path, remove = item
+			if self.error is None:
+				try:
+					with open(path, 'rb') as f:
+						self.proc.stdin.write(f.read())
+				except (IOError, OSError) as e:
+					self.error = e
+			if remove:
+				try:
+					os.remove(path)
+				except OSError:
+					pass
+
+		try:
+			self.proc.stdin.close()
+		except (IOError, OSError):
+			pass
+
+
+	def add(self, path, remove=False):
+		""" Queue an image file to be encoded as the next frame. If 'remove'
+			is True, the file will be deleted once it has been encoded.
+		"""
+		self.queue.put((path, remove))
+
+
+	def close(self):
+		""" Finish encoding and wait for the encoder to exit. Returns True if
+			the movie was written successfully.
+		"""
+		self.queue.put(None)
+		self.thread.join()
+		self.proc.wait()
+
+		if self.proc.returncode != 0 or self.error is not None:
+			self.stderr.seek(0)
+			sys.stderr.write("Encoder failed: %s\n" %self.stderr.read().decode('utf-8', 'replace'))
+			self.stderr.close()
+			return False
+
+		self.stderr.close()
+		return True
+
+# ----------------------------------------------------------------------------
+# End of main class
+# ----------------------------------------------------------------------------
@@ -0,0 +1,50 @@
+#!/usr/bin/python
+
+# environment.py
+#
+# Mike Bonnington <mjbonnington@gmail.com>
+# (c) 2019
+#
+# Host application detection for u-preview.
+# Determines which application we're running in without importing any
+# application modules. A host application has always imported its own
+# Python modules by the time u-preview is loaded, so it's enough to look for
+# them in sys.modules. The result is cached, so it's only worked out once.
+
+
+import os
+import sys
+
+
+# Modules which identify each host application, in order of precedence
+HOST_MODULES = [
+	('MAYA', 'maya.cmds'),
+	('HOUDINI', 'hou'),
+	('NUKE', 'nuke'),
+]
+
+_environment = None
+
+
+def getEnvironment():
+	""" Return the name of the host application, e.g. 'MAYA', or the value
+		of the IC_ENV environment variable, or 'STANDALONE' if no host
+		application is detected.
+	"""
+	global _environment
+	if _environment is None:
+		_environment = os.environ.get('IC_ENV', "STANDALONE")
+		for name, module in HOST_MODULES:
+			if module in sys.modules:
+				_environment = name
+				break
+
+	return _environment
+
+
+def reset():
+	""" Discard the cached environment, so it will be detected again, e.g.
+		after initialising Maya in standalone mode.
+	"""
+	global _environment
+	_environment = None
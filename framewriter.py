@@ -0,0 +1,140 @@
+#!/usr/bin/python
+
+# framewriter.py
+#
+# Mike Bonnington <mjbonnington@gmail.com>
+# (c) 2019
+#
+# Threaded frame writer for u-preview.
+# Frames captured into memory are compressed and written to disk by a pool
+# of worker threads, so the application can evaluate and draw the next frame
+# in the meantime. The total size of the frames waiting to be written is
+# kept within a memory budget by blocking the caller when it is exceeded.
+# This module has no application-specific dependencies. Frames are NumPy
+# arrays of 8-bit RGBA pixels with shape (height, width, 4).
+
+
+import threading
+
+try:
+	import queue
+except ImportError:  # Python 2
+	import Queue as queue
+
+
+# ----------------------------------------------------------------------------
+# Configuration
+# ----------------------------------------------------------------------------
+
+DEFAULT_BUDGET = 512  # Memory budget for queued frames in MB
+DEFAULT_THREADS = 2
+
+
+def saveImage(path, pixels, size=None):
+	""" Write an RGBA pixel array to an image file, scaling it to the given
+		size (width, height) if specified. The pixels should already have
+		the aspect ratio of the size, e.g. cropped to the resolution gate,
+		as they're scaled to fill it exactly. The file format is determined
+		by the extension, e.g. jpg, png or tif. Returns True on success.
+	"""
+	from Qt import QtCore, QtGui
+
+	height, width = pixels.shape[:2]
+	data = pixels.tobytes()
+	try:
+		image = QtGui.QImage(data, width, height, width*4, QtGui.QImage.Format_RGBA8888)
+	except AttributeError:  # Qt 4 has no RGBA format, so swap to BGRA
+		data = pixels[:, :, [2, 1, 0, 3]].tobytes()
+		image = QtGui.QImage(data, width, height, width*4, QtGui.QImage.Format_ARGB32)
+	if size and (width, height) != tuple(size):
+		image = image.scaled(size[0], size[1],
+		                     QtCore.Qt.IgnoreAspectRatio,
+		                     QtCore.Qt.SmoothTransformation)
+
+	return image.save(path, None, 95)
+
+
+# ----------------------------------------------------------------------------
+# Main class
+# ----------------------------------------------------------------------------
+
+class FrameWriter(object):
+	""" Write frames to disk in a pool of worker threads.
+		add() returns as soon as the frame is queued, unless the frames
+		already waiting to be written would exceed the memory budget, in
+		which case it blocks until enough of them have been written. A
+		different 'save' function, taking the same arguments as saveImage(),
+		can be given, e.g. to test with synthetic frames.
+	"""
+	def __init__(self, threads=DEFAULT_THREADS, budget=DEFAULT_BUDGET, save=None):
+		if save is None:
+			import burnin
+			burnin._ensureApplication()  # Image plugins need an application
+			save = saveImage
+		self.save = save
+		self.budget = int(budget * 1024 * 1024)
+		self.queued = 0  # Size of frames waiting to be written in bytes
+		self.peak = 0
+		self.written = 0
+		self.failed_ls = []
+
+		self.condition = threading.Condition()
+		self.queue = queue.Queue()
+		self.thread_ls = []
+		for i in range(max(1, threads)):
+			thread = threading.Thread(target=self.work)
+			thread.daemon = True
+			thread.start()
+			self.thread_ls.append(thread)
+
+
+	def add(self, path, pixels, size=None):
+		""" Queue a frame to be written to 'path', blocking while the memory
+			budget is full. A frame larger than the budget is still accepted
+			once the queue is empty.
+		"""
+		nbytes = pixels.nbytes
+		with self.condition:
+			while self.queued and self.queued + nbytes > self.budget:
+				self.condition.wait()
+			self.queued += nbytes
+			self.peak = max(self.peak, self.queued)
+		self.queue.put((path, pixels, size))
+
+
+	def work(self):
+		""" Write queued frames until the end of the stream.
+		"""
+		while True:
+			item = self.queue.get()
+			if item is None:
+				break
+			path, pixels, size = item
+			try:
+				success = self.save(path, pixels, size)
+			except Exception:
+				success = False
+
+			with self.condition:
+				if success:
+					self.written += 1
+				else:
+					self.failed_ls.append(path)
+				self.queued -= pixels.nbytes
+				self.condition.notify_all()
+
+
+	def close(self):
+		""" Wait for all the queued frames to be written. Returns the list of
+			paths which could not be written.
+		"""
+		for thread in self.thread_ls:
+			self.queue.put(None)
+		for thread in self.thread_ls:
+			thread.join()
+
+		return self.failed_ls
+
+# ----------------------------------------------------------------------------
+# End of main class
+# ----------------------------------------------------------------------------
@@ -0,0 +1,221 @@
+#!/usr/bin/python
+
+# nametemplate.py
+#
+# Mike Bonnington <mjbonnington@gmail.com>
+# (c) 2019
+#
+# Output name templates for u-preview.
+# Compiles a name pattern containing tokens such as <Scene> and <Camera>
+# into a format string once, so invalid patterns are caught up front and
+# names can be generated quickly, e.g. on every keystroke or for every shot
+# in a batch. <Version> is resolved from a cached index of the existing
+# outputs, which is only refreshed when the directory changes. This module
+# has no application-specific dependencies.
+
+
+import getpass
+import os
+import re
+import time
+
+
+# Tokens which can be used in output names
+TOKENS = ('Scene', 'Camera', 'Date', 'User', 'Shot', 'Res', 'Version')
+
+TOKEN_RE = re.compile(r'<([^<>]*)>')
+LITERAL_RE = re.compile(r'^[\w.-]*$')
+VERSION_FORMAT = "v%03d"
+VERSION_RE = r'v(\d+)'
+
+
+def getContext(scene, camera, res, shot=None, user=None, date=None):
+	""" Return a dictionary of values for the tokens, other than <Version>.
+		The shot defaults to the PREVIEW_SHOT environment variable, the user
+		to the current user and the date to today.
+	"""
+	context = {}
+	context['Scene'] = scene
+	context['Camera'] = camera
+	context['Res'] = "%dx%d" %(res[0], res[1])
+	context['Shot'] = shot if shot is not None else os.environ.get('PREVIEW_SHOT', "")
+	context['User'] = user if user is not None else getpass.getuser()
+	context['Date'] = date if date is not None else time.strftime('%Y%m%d')
+	return context
+
+
+# ----------------------------------------------------------------------------
+# Version index class
+# ----------------------------------------------------------------------------
+
+class VersionIndex(object):
+	""" Index of the outputs in a directory, used to find the latest
+		version of a name. The directory is listed once, then only listed
+		again when its modification time changes. Versions handed out by
+		reserve() are remembered until then, so names generated together
+		get different versions.
+	"""
+	def __init__(self, directory):
+		self.directory = directory
+		self.mtime = None
+		self.listed = False
+		self.name_ls = []
+		self.version_dict = {}  # Latest version, keyed by name parts
+
+
+	def refresh(self):
+		""" List the directory again if it has changed.
+		"""
+		try:
+			mtime = os.stat(self.directory).st_mtime
+		except OSError:  # Doesn't exist yet
+			mtime = None
+
+		if mtime != self.mtime or not self.listed:
+			self.mtime = mtime
+			self.listed = True
+			try:
+				self.name_ls = os.listdir(self.directory)
+			except OSError:
+				self.name_ls = []
+			self.version_dict = {}
+
+
+	def latestVersion(self, part_ls):
+		""" Return the highest version of a name in the directory, or 0 if
+			there are none. The name is given as a list of the parts either
+			side of its version number(s).
+		"""
+		self.refresh()
+		key = tuple(part_ls)
+		try:
+			return self.version_dict[key]
+		except KeyError:
+			pass
+
+		# The first version number is captured, and any others must match it
+		pattern = re.escape(part_ls[0]) + VERSION_RE
+		for part in part_ls[1:-1]:
+			pattern += re.escape(part) + r'v\1'
+		pattern += re.escape(part_ls[-1])
+		regex = re.compile('^%s$' %pattern)
+
+		latest = 0
+		for name in self.name_ls:
+			match = regex.match(name)
+			if match:
+				latest = max(latest, int(match.group(1)))
+		self.version_dict[key] = latest
+		return latest
+
+
+	def reserve(self, part_ls):
+		""" Return the next version of a name and mark it as taken.
+		"""
+		version = self.latestVersion(part_ls) + 1
+		self.version_dict[tuple(part_ls)] = version
+		return version
+
+# ----------------------------------------------------------------------------
+# End of version index class
+# ----------------------------------------------------------------------------
+
+
+_index_dict = {}
+
+
+def getVersionIndex(directory):
+	""" Return the shared version index for a directory.
+	"""
+	try:
+		return _index_dict[directory]
+	except KeyError:
+		index = _index_dict[directory] = VersionIndex(directory)
+		return index
+
+
+# ----------------------------------------------------------------------------
+# Main class
+# ----------------------------------------------------------------------------
+
+class NameTemplate(object):
+	""" A compiled output name pattern, e.g. "<Scene>_<Camera>_<Version>".
+		Raises ValueError if the pattern is empty, contains an unknown
+		token, or contains characters which aren't allowed in file names.
+	"""
+	def __init__(self, pattern):
+		self.pattern = pattern
+		self.token_ls = []
+
+		format_ls = []
+		pos = 0
+		for match in TOKEN_RE.finditer(pattern):
+			format_ls.append(self.compileLiteral(pattern[pos:match.start()]))
+			token = match.group(1)
+			if token not in TOKENS:
+				raise ValueError("Unknown token <%s> in output name." %token)
+			if token not in self.token_ls:
+				self.token_ls.append(token)
+			format_ls.append('{%s}' %token)
+			pos = match.end()
+		format_ls.append(self.compileLiteral(pattern[pos:]))
+
+		self.format = "".join(format_ls)
+		if not self.format:
+			raise ValueError("Output name is empty.")
+
+
+	def compileLiteral(self, text):
+		""" Check the text between tokens and escape it for the format string.
+		"""
+		if not LITERAL_RE.match(text):
+			raise ValueError("Invalid characters in output name: '%s'" %text)
+		return text
+
+
+	def uses(self, token):
+		""" Return True if the pattern contains the given token.
+		"""
+		return token in self.token_ls
+
+
+	def expand(self, context, index=None, reserve=False):
+		""" Return the name for a dictionary of token values, e.g. from
+			getContext(). <Version> is resolved from the version index as the
+			next version after the latest one. If 'reserve' is True, the
+			version is marked as taken.
+		"""
+		values = dict(context)
+		if self.uses('Version'):
+			values['Version'] = '\0'  # Marks where the version goes
+		try:
+			name = self.format.format(**values)
+		except KeyError as e:
+			raise ValueError("No value for token <%s> in output name." %e.args[0])
+
+		if self.uses('Version'):
+			part_ls = name.split('\0')
+			if index is None:
+				version = 1
+			elif reserve:
+				version = index.reserve(part_ls)
+			else:
+				version = index.latestVersion(part_ls) + 1
+			name = (VERSION_FORMAT %version).join(part_ls)
+
+		if not name:
+			raise ValueError("Output name is empty.")
+		return name
+
+
+	def expandAll(self, context_ls, index=None):
+		""" Return a list of names, one for each dictionary of token values,
+			e.g. for every camera or scene in a batch. Versions are reserved,
+			so names which would otherwise be the same get successive
+			versions.
+		"""
+		return [self.expand(context, index, reserve=True) for context in context_ls]
+
+# ----------------------------------------------------------------------------
+# End of main class
+# ----------------------------------------------------------------------------
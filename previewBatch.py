@@ -0,0 +1,324 @@
+#!/usr/bin/python
+
+# previewBatch.py
+#
+# Mike Bonnington <mjbonnington@gmail.com>
+# (c) 2019
+#
+# Batch playblasts for u-preview.
+# Playblasts a list of scene files without any UI, using the same options as
+# the Preview UI, read from a JSON file. The scenes are shared between a pool
+# of persistent mayapy worker processes, so Maya and its plug-ins are only
+# loaded once per process rather than once per scene. Scene files can be
+# listed on the command line, or in a text file given as @shots.txt.
+#
+# Usage: mayapy previewBatch.py [-o options.json] [-j processes]
+#                               [-r report.json] scene [scene ...]
+
+
+import argparse
+import json
+import os
+import sys
+import threading
+
+try:
+	import queue
+except ImportError:  # Python 2
+	import Queue as queue
+
+import nametemplate
+import previewWorker
+from result import PlayblastResult
+
+
+# Options used for anything not specified in the options file. Options set
+# to None are taken from each scene.
+DEFAULT_OPTIONS = {
+	'name': "<Scene>",  # Output name, see nametemplate.TOKENS
+	'outputDir': None,  # Defaults to the project's playblasts directory
+	'format': "JPEG sequence",
+	'camera': None,  # Defaults to the first renderable camera
+	'res': None,
+	'frRange': None,
+	'frameList': None,
+	'frameStep': 1,
+	'noSelect': True,
+	'guides': False,
+	'burnin': False,
+	'burninMode': 'post',
+	'resume': False,
+	'incremental': False,
+	'viewportProfile': "Current settings",
+	'resizeOutputs': None,
+	'memoryLimit': 0,
+}
+
+# UI options which can't be used in batch playblasts, with the reason
+UNSUPPORTED_OPTIONS = {
+	'renderableCameras': "Capturing all renderable cameras needs a model panel to switch cameras in, which batch playblasts don't have. Use a separate batch with the 'camera' option for each camera.",
+}
+
+
+# ----------------------------------------------------------------------------
+# Worker functions
+# ----------------------------------------------------------------------------
+
+def getCamera(opts):
+	""" Return the camera to playblast from in the open scene: the one
+		named in the options, otherwise the first renderable camera.
+	"""
+	import appConnect
+
+	if opts['camera']:
+		return opts['camera']
+	try:
+		return appConnect.getCameras(renderableOnly=True)[0]
+	except IndexError:
+		raise RuntimeError("No renderable camera found in scene.")
+
+
+def queryScene(options):
+	""" Return a dictionary of the values the output name may need from the
+		open scene: the camera, the resolution and the playblasts
+		directory. Called in the worker process.
+	"""
+	import appConnect
+
+	opts = dict(DEFAULT_OPTIONS)
+	opts.update(options)
+
+	info = {}
+	info['status'] = "Completed"
+	info['camera'] = getCamera(opts)
+	info['res'] = list(opts['res'] or appConnect.getResolution())
+	info['playblastsDir'] = appConnect.getPlayblastsDir()
+	return info
+
+
+def createPreview(options, fileInput):
+	""" Create a preview object for the open scene from the batch options,
+		filling in the options which depend on the scene. 'fileInput' is the
+		output name, already resolved by the parent process. Called in the
+		worker process.
+	"""
+	import appConnect
+
+	opts = dict(DEFAULT_OPTIONS)
+	opts.update(options)
+
+	previewSetup = appConnect.AppConnect(fileInput=fileInput,
+	                                     format=opts['format'],
+	                                     activeView=None,
+	                                     camera=getCamera(opts),
+	                                     res=opts['res'] or appConnect.getResolution(),
+	                                     frRange=opts['frRange'] or appConnect.getFrameRange(),
+	                                     offscreen=True,
+	                                     noSelect=opts['noSelect'],
+	                                     guides=opts['guides'],
+	                                     burnin=opts['burnin'],
+	                                     interruptible=False,
+	                                     resume=opts['resume'],
+	                                     incremental=opts['incremental'],
+	                                     burninMode=opts['burninMode'],
+	                                     viewportProfile=opts['viewportProfile'],
+	                                     frameStep=opts['frameStep'],
+	                                     frameList=opts['frameList'],
+	                                     resizeOutputs=opts['resizeOutputs'],
+	                                     memoryLimit=opts['memoryLimit'],
+	                                     headless=True,
+	                                     outputDir=opts['outputDir'])
+	return previewSetup.createPreview()
+
+# ----------------------------------------------------------------------------
+# End of worker functions
+# ============================================================================
+# Batch functions
+# ----------------------------------------------------------------------------
+
+def runPool(job_ls, processes=1, interpreter=None, verb="Playblasting"):
+	""" Run each job in a pool of persistent worker processes. Returns a
+		list of (message, log) tuples in the order given, where 'message'
+		is the result message, or None if the worker exited unexpectedly,
+		in which case 'log' is the tail of its output. A worker which exits
+		unexpectedly is replaced.
+	"""
+	job_queue = queue.Queue()
+	for i, job in enumerate(job_ls):
+		job_queue.put((i, job))
+	msg_ls = [None] * len(job_ls)
+
+	def work():
+		worker = previewWorker.PersistentWorker(interpreter)
+		while True:
+			try:
+				i, job = job_queue.get_nowait()
+			except queue.Empty:
+				break
+
+			print("%s %s" %(verb, job['scene']))
+			msg = worker.run(job)
+			if msg is None:
+				msg_ls[i] = (None, "\n".join(worker.log[-10:]))
+				worker.close()
+				worker = previewWorker.PersistentWorker(interpreter)
+			else:
+				msg_ls[i] = (msg, "")
+		worker.close()
+
+	thread_ls = []
+	for i in range(max(1, min(processes, len(job_ls)))):
+		thread = threading.Thread(target=work)
+		thread.start()
+		thread_ls.append(thread)
+	for thread in thread_ls:
+		thread.join()
+
+	return msg_ls
+
+
+def resolveNames(scene_ls, options, processes=1, interpreter=None):
+	""" Return a list of (fileInput, options, error) tuples, one for each
+		scene. The output names are all resolved here rather than in the
+		workers, so a <Version> reserved for one scene is seen by the
+		others. Token values are taken from the options and the scene file
+		names where possible. Otherwise each scene is opened in a worker to
+		query them first, and the camera found is added to its options so
+		the playblast matches the name. 'error' is the reason a scene
+		couldn't be queried, or None.
+	"""
+	opts = dict(DEFAULT_OPTIONS)
+	opts.update(options)
+	template = nametemplate.NameTemplate(opts['name'])
+
+	if (template.uses('Camera') and not opts['camera']) \
+	or (template.uses('Res') and not opts['res']) \
+	or (template.uses('Version') and not opts['outputDir']):
+		msg_ls = runPool([{'scene': scene, 'query': True, 'options': options} for scene in scene_ls],
+		                 processes, interpreter, verb="Querying")
+	else:
+		msg_ls = [({}, "")] * len(scene_ls)
+
+	context_ls = []
+	dir_ls = []
+	options_ls = []
+	error_ls = []
+	for scene, (msg, log) in zip(scene_ls, msg_ls):
+		sceneOptions = dict(options)
+		error = None
+		if msg is None:
+			error = log
+			msg = {}
+		elif msg.get('status') == "Failed":
+			error = msg.get('message')
+		if msg.get('camera') and not opts['camera']:
+			sceneOptions['camera'] = msg['camera']
+
+		sceneName = os.path.splitext(os.path.basename(scene))[0] or "untitled"
+		context_ls.append(nametemplate.getContext(sceneName,
+		                                          sceneOptions.get('camera') or "",
+		                                          opts['res'] or msg.get('res') or (0, 0)))
+		dir_ls.append(opts['outputDir'] or msg.get('playblastsDir'))
+		options_ls.append(sceneOptions)
+		error_ls.append(error)
+
+	# Expand the names for each output directory together, so scenes with
+	# the same name get successive versions
+	name_ls = [None] * len(scene_ls)
+	for directory in set(dir_ls):
+		index_ls = [i for i, d in enumerate(dir_ls) if d == directory and error_ls[i] is None]
+		index = nametemplate.getVersionIndex(directory) if directory else None
+		expanded_ls = template.expandAll([context_ls[i] for i in index_ls], index)
+		for i, name in zip(index_ls, expanded_ls):
+			name_ls[i] = name
+
+	return list(zip(name_ls, options_ls, error_ls))
+
+
+def runBatch(scene_ls, options, processes=1, interpreter=None):
+	""" Playblast each scene in a pool of persistent worker processes.
+		Returns a list of (scene, result) tuples in the order given, where
+		'result' is a PlayblastResult. A worker which exits unexpectedly is
+		replaced, and its scene reported as failed.
+	"""
+	result_ls = [None] * len(scene_ls)
+	job_ls = []
+	jobIndex_ls = []
+	for i, (fileInput, sceneOptions, error) in enumerate(resolveNames(scene_ls, options, processes, interpreter)):
+		if error is not None:
+			result_ls[i] = (scene_ls[i], PlayblastResult("Failed", message=error))
+		else:
+			job_ls.append({'scene': scene_ls[i], 'options': sceneOptions, 'fileInput': fileInput})
+			jobIndex_ls.append(i)
+
+	for i, (msg, log) in zip(jobIndex_ls, runPool(job_ls, processes, interpreter)):
+		if msg is None:
+			result = PlayblastResult("Failed", message=log)
+		else:
+			result = PlayblastResult.fromDict(msg)
+		result_ls[i] = (scene_ls[i], result)
+
+	for scene, result in result_ls:
+		if result.completed():
+			print("%s: %s %s (%d frames, %.1f MB)" %(scene, result.status, result.path, len(result.frames), result.bytes / 1048576.0))
+		else:
+			print("%s: %s %s" %(scene, result.status, result.message))
+
+	return result_ls
+
+
+def loadOptions(optionsFile):
+	""" Read batch options from a JSON file.
+	"""
+	with open(optionsFile, 'r') as f:
+		options = json.load(f)
+
+	for key in options:
+		if key in UNSUPPORTED_OPTIONS:
+			raise ValueError("Option '%s' in %s is not supported: %s" %(key, optionsFile, UNSUPPORTED_OPTIONS[key]))
+		if key not in DEFAULT_OPTIONS:
+			raise ValueError("Unknown option '%s' in %s" %(key, optionsFile))
+	if 'name' in options:
+		nametemplate.NameTemplate(options['name'])  # Check it before starting
+	return options
+
+
+def main(argv=None):
+	""" Run a batch of playblasts from the command line. Returns True if
+		every playblast completed.
+	"""
+	parser = argparse.ArgumentParser(
+		description="Playblast a list of Maya scenes without a UI.",
+		fromfile_prefix_chars='@')
+	parser.add_argument('scenes', nargs='+', metavar='scene',
+		help="scene file to playblast, or @file listing scene files")
+	parser.add_argument('-o', '--options',
+		help="JSON file of playblast options")
+	parser.add_argument('-j', '--processes', type=int, default=1,
+		help="number of worker processes (default 1)")
+	parser.add_argument('-r', '--report',
+		help="write the results to this JSON file")
+	args = parser.parse_args(argv)
+
+	options = loadOptions(args.options) if args.options else {}
+	scene_ls = [scene.strip() for scene in args.scenes if scene.strip()]
+	result_ls = runBatch(scene_ls, options, processes=args.processes)
+
+	failed_ls = [scene for scene, result in result_ls if not result.completed()]
+	print("%d of %d scenes playblasted." %(len(result_ls) - len(failed_ls), len(result_ls)))
+	for scene in failed_ls:
+		print("Failed: %s" %scene)
+
+	if args.report:
+		with open(args.report, 'w') as f:
+			json.dump([dict(result.toDict(), scene=scene) for scene, result in result_ls], f, indent=4)
+
+	return not failed_ls
+
+# ----------------------------------------------------------------------------
+# End of batch functions
+# ----------------------------------------------------------------------------
+
+
+if __name__ == '__main__':
+	sys.exit(0 if main() else 1)
@@ -0,0 +1,341 @@
+#!/usr/bin/python
+
+# previewWorker.py
+#
+# Mike Bonnington <mjbonnington@gmail.com>
+# (c) 2019
+#
+# Headless playblast worker for u-preview.
+# When run as a script under mayapy, reads a job file, opens the scene and
+# generates a playblast without any UI. Progress (each frame as it's
+# captured) and results are reported back to the parent process as tagged
+# JSON lines on stdout. With --serve, the worker stays running and
+# reads jobs from stdin, one JSON object per line, so Maya and its plug-ins
+# only have to load once for a series of playblasts. The rest of this module
+# provides the functions used by the parent process to launch and monitor
+# workers.
+#
+# Usage: mayapy previewWorker.py <job.json>
+#        mayapy previewWorker.py --serve
+
+
+import json
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+import threading
+
+from result import PlayblastResult
+
+try:
+	import queue
+except ImportError:  # Python 2
+	import Queue as queue
+
+
+# Lines written to stdout starting with this tag are messages for the parent
+# process. Everything else (e.g. Maya's own output) is treated as log text.
+MESSAGE_TAG = "@preview "
+
+
+# ----------------------------------------------------------------------------
+# Parent process functions
+# ----------------------------------------------------------------------------
+
+def getInterpreter():
+	""" Return the path to the mayapy interpreter used to run workers.
+		Can be overridden by setting the PREVIEW_MAYAPY environment
+		variable, e.g. to point at a regular Python interpreter with a stub
+		'maya' package on its path for testing.
+	"""
+	try:
+		return os.environ['PREVIEW_MAYAPY']
+	except KeyError:
+		pass
+
+	exe = "mayapy.exe" if sys.platform == 'win32' else "mayapy"
+	try:
+		return os.path.join(os.environ['MAYA_LOCATION'], 'bin', exe)
+	except KeyError:
+		return os.path.join(os.path.dirname(sys.executable), exe)
+
+
+def writeJob(job):
+	""" Write the job dictionary to a temporary JSON file and return its
+		path.
+	"""
+	fd, jobFile = tempfile.mkstemp(prefix='preview_job_', suffix='.json')
+	with os.fdopen(fd, 'w') as f:
+		json.dump(job, f, indent=4, sort_keys=True)
+
+	return jobFile
+
+
+def parseMessage(line):
+	""" Return the message dictionary contained in a line of worker output,
+		or None if the line is not a worker message.
+	"""
+	if line.startswith(MESSAGE_TAG):
+		try:
+			return json.loads(line[len(MESSAGE_TAG):])
+		except ValueError:
+			pass
+
+	return None
+
+
+class WorkerProcess(object):
+	""" Launch a worker process for the given job and monitor its output in
+		a background thread, so that several workers can run concurrently
+		without blocking on full pipes. 'tmpDir' is a temporary directory,
+		e.g. containing a copy of the scene, to delete when the worker is
+		finished. 'frames' is the number of frames to be captured, used to
+		report progress until the worker reports the actual number, e.g.
+		after skipping the frames which are already up to date.
+	"""
+	def __init__(self, job, interpreter=None, tmpDir=None, frames=0):
+		self.jobFile = writeJob(job)
+		self.tmpDir = tmpDir
+		self.result = None
+		self.messages = []
+		self.log = []
+		self.frames = frames
+		self.framesDone = 0
+
+		if interpreter is None:
+			interpreter = getInterpreter()
+		script = os.path.splitext(os.path.abspath(__file__))[0] + '.py'
+
+		self.proc = subprocess.Popen([interpreter, script, self.jobFile],
+		                             stdout=subprocess.PIPE,
+		                             stderr=subprocess.STDOUT,
+		                             universal_newlines=True)
+
+		self.thread = threading.Thread(target=self.read)
+		self.thread.daemon = True
+		self.thread.start()
+
+
+	def read(self):
+		""" Read the worker's output until the process exits.
+		"""
+		for line in iter(self.proc.stdout.readline, ''):
+			msg = parseMessage(line)
+			if msg is None:
+				self.log.append(line.rstrip())
+				del self.log[:-100]  # Only keep the tail of the log
+			else:
+				if msg.get('type') == 'result':
+					self.result = msg
+				elif msg.get('type') == 'progress':
+					self.framesDone += 1
+					if msg.get('total'):
+						self.frames = msg['total']
+				self.messages.append(msg)
+		self.proc.stdout.close()
+
+
+	def running(self):
+		""" Return True if the worker process is still running.
+		"""
+		return self.proc.poll() is None
+
+
+	def finished(self):
+		""" Return True if the worker process has exited and all of its
+			output has been read.
+		"""
+		return not self.running() and not self.thread.is_alive()
+
+	def wait(self):
+		""" Wait for the worker to finish, clean up the job file and return
+			the result message, or None if the worker didn't report one.
+		"""
+		self.proc.wait()
+		self.thread.join()
+		try:
+			os.remove(self.jobFile)
+		except OSError:
+			pass
+		if self.tmpDir:
+			shutil.rmtree(self.tmpDir, ignore_errors=True)
+			self.tmpDir = None
+
+		return self.result
+
+
+	def terminate(self):
+		""" Kill the worker process.
+		"""
+		if self.running():
+			self.proc.terminate()
+
+
+class PersistentWorker(object):
+	""" Launch a worker process which runs jobs one at a time until it's
+		closed. A job can be a Preview job, {'scene': path, 'preview':
+		kwargs}, or a batch job with PreviewUI-style options, {'scene': path,
+		'options': options}.
+	"""
+	def __init__(self, interpreter=None):
+		self.result_queue = queue.Queue()
+		self.log = []
+		self.framesDone = 0
+
+		if interpreter is None:
+			interpreter = getInterpreter()
+		script = os.path.splitext(os.path.abspath(__file__))[0] + '.py'
+
+		self.proc = subprocess.Popen([interpreter, script, '--serve'],
+		                             stdin=subprocess.PIPE,
+		                             stdout=subprocess.PIPE,
+		                             stderr=subprocess.STDOUT,
+		                             universal_newlines=True)
+
+		self.thread = threading.Thread(target=self.read)
+		self.thread.daemon = True
+		self.thread.start()
+
+
+	def read(self):
+		""" Read the worker's output until the process exits. Results are
+			passed to run() through a queue, followed by None when the
+			process exits.
+		"""
+		for line in iter(self.proc.stdout.readline, ''):
+			msg = parseMessage(line)
+			if msg is None:
+				self.log.append(line.rstrip())
+				del self.log[:-100]  # Only keep the tail of the log
+			elif msg.get('type') == 'result':
+				self.result_queue.put(msg)
+			elif msg.get('type') == 'progress':
+				self.framesDone += 1
+		self.proc.stdout.close()
+		self.result_queue.put(None)
+
+
+	def running(self):
+		""" Return True if the worker process is still running.
+		"""
+		return self.proc.poll() is None
+
+
+	def run(self, job):
+		""" Send a job to the worker and wait for the result message.
+			Returns None if the worker process has exited.
+		"""
+		try:
+			self.proc.stdin.write(json.dumps(job) + '\n')
+			self.proc.stdin.flush()
+		except (IOError, OSError, ValueError):  # Pipe closed
+			return None
+
+		return self.result_queue.get()
+
+
+	def close(self):
+		""" Tell the worker there are no more jobs and wait for it to exit.
+		"""
+		try:
+			self.proc.stdin.close()
+		except (IOError, OSError):
+			pass
+		self.proc.wait()
+		self.thread.join()
+
+# ----------------------------------------------------------------------------
+# End of parent process functions
+# ============================================================================
+# Worker functions
+# ----------------------------------------------------------------------------
+
+def emit(msgType, **kwargs):
+	""" Write a message for the parent process to stdout.
+	"""
+	kwargs['type'] = msgType
+	sys.stdout.write("%s%s\n" %(MESSAGE_TAG, json.dumps(kwargs)))
+	sys.stdout.flush()
+
+
+def initialize():
+	""" Initialise Maya in standalone mode. Returns the maya.standalone
+		module, or None if running with a stub maya.cmds module.
+	"""
+	try:
+		import maya.standalone as standalone
+		standalone.initialize(name='python')
+	except ImportError:
+		standalone = None
+	return standalone
+
+
+def runJob(job):
+	""" Open the job's scene file and generate the playblast, reporting
+		progress and the result to the parent process. Returns True if the
+		playblast completed. A query job only reports the values needed to
+		resolve the output name.
+	"""
+	import maya.cmds as mc
+
+	try:
+		if job.get('scene'):
+			mc.file(job['scene'], open=True, force=True)
+
+		if job.get('query'):  # Batch output name query
+			import previewBatch
+			emit('result', **previewBatch.queryScene(job['options']))
+			return True
+
+		if 'options' in job:  # Batch job with PreviewUI-style options
+			import previewBatch
+			previewSetup = previewBatch.createPreview(job['options'], job['fileInput'])
+		else:
+			import u_preview2_maya
+			previewSetup = u_preview2_maya.Preview(**job['preview'])
+		previewSetup.progress = lambda frame: emit('progress', frame=frame, total=previewSetup.framesTotal)
+		result = previewSetup.playblast_()
+
+	except Exception as e:
+		result = PlayblastResult("Failed", message=str(e))
+
+	emit('result', **result.toDict())
+	return result.completed()
+
+
+def run(jobFile):
+	""" Initialise Maya, open the job's scene file and generate the playblast.
+	"""
+	with open(jobFile, 'r') as f:
+		job = json.load(f)
+
+	standalone = initialize()
+	try:
+		return runJob(job)
+	finally:
+		if standalone is not None:
+			standalone.uninitialize()
+
+
+def serve():
+	""" Initialise Maya once, then run jobs read from stdin until it's
+		closed.
+	"""
+	standalone = initialize()
+	try:
+		for line in iter(sys.stdin.readline, ''):
+			if line.strip():
+				runJob(json.loads(line))
+		return True
+	finally:
+		if standalone is not None:
+			standalone.uninitialize()
+
+
+if __name__ == '__main__':
+	if sys.argv[1] == '--serve':
+		sys.exit(0 if serve() else 1)
+	else:
+		sys.exit(0 if run(sys.argv[1]) else 1)
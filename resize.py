@@ -0,0 +1,72 @@
+#!/usr/bin/python
+
+# resize.py
+#
+# Mike Bonnington <mjbonnington@gmail.com>
+# (c) 2019
+#
+# Frame resizer for u-preview.
+# Writes downsampled copies of captured frames, e.g. proxies and thumbnails,
+# in a pool of worker threads, so several resolutions can be produced from a
+# single capture.
+
+
+import os
+
+from multiprocessing.pool import ThreadPool
+
+from Qt import QtCore, QtGui
+
+import burnin
+
+
+# ----------------------------------------------------------------------------
+# Main class
+# ----------------------------------------------------------------------------
+
+class Resizer(object):
+	""" Write resized copies of image files.
+	"""
+	def __init__(self, threads=None):
+		burnin._ensureApplication()
+		self.threads = threads
+
+
+	def resizeFrame(self, src, dst, size):
+		""" Write a copy of the image file at 'src' to 'dst', scaled to the
+			given size (width, height).
+		"""
+		image = QtGui.QImage(src)
+		if image.isNull():
+			return False
+		image = image.scaled(size[0], size[1],
+		                     QtCore.Qt.IgnoreAspectRatio,
+		                     QtCore.Qt.SmoothTransformation)
+
+		directory = os.path.dirname(dst)
+		if not os.path.isdir(directory):
+			try:
+				os.makedirs(directory)
+			except OSError:  # Created by another thread
+				pass
+
+		return image.save(dst, None, 90)
+
+
+	def process(self, item_ls):
+		""" Resize a list of frames in parallel. Each item in the list is a
+			tuple (src, dst, size). Returns the number of frames which could
+			not be processed.
+		"""
+		pool = ThreadPool(self.threads)
+		try:
+			result_ls = pool.map(lambda item: self.resizeFrame(*item), item_ls)
+		finally:
+			pool.close()
+			pool.join()
+
+		return result_ls.count(False)
+
+# ----------------------------------------------------------------------------
+# End of main class
+# ----------------------------------------------------------------------------
@@ -0,0 +1,96 @@
+#!/usr/bin/python
+
+# result.py
+#
+# Mike Bonnington <mjbonnington@gmail.com>
+# (c) 2019
+#
+# Playblast results for u-preview.
+# The outcome of a playblast, with the frames and bytes written and the time
+# spent in each stage, so callers can log and aggregate performance without
+# parsing messages or listing the output directory. Results can be
+# converted to and from dictionaries to pass them between processes. This
+# module has no application-specific dependencies.
+
+
+# ----------------------------------------------------------------------------
+# Main class
+# ----------------------------------------------------------------------------
+
+class PlayblastResult(object):
+	""" The result of a playblast.
+		status        : "Completed", "Interrupted", "Failed", or "Started"
+		                for playblasts running in the background.
+		path          : output path, or a list of paths for multi-camera
+		                playblasts.
+		message       : reason for failure.
+		frames        : list of the frames written.
+		bytes         : total size of the files written.
+		timings       : dictionary of the seconds spent in each stage
+		                (setup, capture, restore and post).
+		warnings      : list of warnings issued during the playblast.
+		timingReport  : per-frame capture timings from timing.FrameTimer.
+		worker        : the worker process for background playblasts.
+		For compatibility, results can also be indexed like the tuples
+		previously returned, i.e. (status, path or message, timingReport).
+	"""
+	__slots__ = ('status', 'path', 'message', 'frames', 'bytes', 'timings',
+	             'warnings', 'timingReport', 'worker')
+
+	# Stages of a playblast, in order
+	STAGES = ('setup', 'capture', 'restore', 'post')
+
+	# Attributes which are converted to and from dictionaries
+	FIELDS = ('status', 'path', 'message', 'frames', 'bytes', 'timings',
+	          'warnings', 'timingReport')
+
+	def __init__(self, status, path=None, message="", frames=None, bytes=0,
+	             timings=None, warnings=None, timingReport=None, worker=None):
+		self.status = status
+		self.path = path
+		self.message = message
+		self.frames = frames or []
+		self.bytes = bytes
+		self.timings = timings or {}
+		self.warnings = warnings or []
+		self.timingReport = timingReport
+		self.worker = worker
+
+
+	def __getitem__(self, index):
+		""" Legacy tuple access.
+		"""
+		if self.status == "Failed":
+			output = self.message
+		else:
+			output = self.path
+		return (self.status, output, self.timingReport)[index]
+
+
+	def __repr__(self):
+		return "PlayblastResult(%r, %r, frames=%d, bytes=%d)" %(self.status, self.path or self.message, len(self.frames), self.bytes)
+
+
+	def completed(self):
+		""" Return True if the playblast completed.
+		"""
+		return self.status == "Completed"
+
+
+	def toDict(self):
+		""" Return the result as a dictionary, e.g. for JSON serialisation.
+		"""
+		return dict((field, getattr(self, field)) for field in self.FIELDS)
+
+
+	@classmethod
+	def fromDict(cls, result_dict):
+		""" Create a result from a dictionary returned by toDict(). Unknown
+			keys are ignored.
+		"""
+		kwargs = dict((field, result_dict[field]) for field in cls.FIELDS if field in result_dict)
+		return cls(**kwargs)
+
+# ----------------------------------------------------------------------------
+# End of main class
+# ----------------------------------------------------------------------------
@@ -0,0 +1,253 @@
+#!/usr/bin/python
+
+# sequence.py
+#
+# Mike Bonnington <mjbonnington@gmail.com>
+# (c) 2019
+#
+# Frame range and image sequence helpers for u-preview. This module has no
+# application-specific dependencies.
+
+
+import os
+import re
+import shutil
+
+try:
+	from os import scandir
+except ImportError:  # Python 2
+	try:
+		from scandir import scandir
+	except ImportError:
+		scandir = None
+
+
+# A single item of a frame list expression: a frame, or a range with an
+# optional step, e.g. '1062', '1001-1040' or '1100-1180x2'
+FRAME_LIST_ITEM = re.compile(r'^\s*(-?\d+)\s*(?:-\s*(-?\d+)\s*(?:x\s*(\d+))?)?\s*$')
+
+# Byte sequences that a complete image file of each type ends with
+TRAILERS = {
+	'jpg': b'\xff\xd9', 
+	'png': b'IEND\xaeB`\x82', 
+}
+
+
+# ----------------------------------------------------------------------------
+# Frame ranges
+# ----------------------------------------------------------------------------
+
+def chunkRange(frRange, chunks):
+	""" Split an inclusive frame range (start, end) into a list of at most
+		'chunks' contiguous sub-ranges of near-equal length.
+	"""
+	start, end = int(frRange[0]), int(frRange[1])
+	length = end - start + 1
+	chunks = max(1, min(int(chunks), length))
+
+	chunk_ls = []
+	size, remainder = divmod(length, chunks)
+	for i in range(chunks):
+		chunkEnd = start + size - 1
+		if i < remainder:
+			chunkEnd += 1
+		chunk_ls.append((start, chunkEnd))
+		start = chunkEnd + 1
+
+	return chunk_ls
+
+
+def chunkFrames(frames, chunks):
+	""" Split a list of frames into at most 'chunks' slices containing a
+		near-equal number of frames, returning the inclusive frame range
+		(first, last) spanned by each slice.
+	"""
+	return [(slice_ls[0], slice_ls[-1]) for slice_ls in splitFrames(frames, chunks)]
+
+
+def splitFrames(frames, chunks):
+	""" Split a list of frames into at most 'chunks' sorted slices
+		containing a near-equal number of frames.
+	"""
+	frames = sorted(frames)
+	return [frames[a:b+1] for a, b in chunkRange((0, len(frames)-1), chunks)]
+
+
+def groupFrames(frames):
+	""" Group a list of frame numbers into a list of inclusive contiguous
+		ranges (start, end).
+	"""
+	range_ls = []
+	for frame in sorted(set(frames)):
+		if range_ls and frame == range_ls[-1][1] + 1:
+			range_ls[-1] = (range_ls[-1][0], frame)
+		else:
+			range_ls.append((frame, frame))
+
+	return range_ls
+
+
+def batchFrames(frames, minRun=2):
+	""" Divide a list of frames into the contiguous runs of at least
+		'minRun' frames, which can each be rendered as a range, and a list of
+		the remaining isolated frames, which can be rendered together.
+		Returns a tuple (range_ls, frame_ls).
+	"""
+	range_ls = []
+	frame_ls = []
+	for frRange in groupFrames(frames):
+		if frRange[1] - frRange[0] + 1 >= minRun:
+			range_ls.append(frRange)
+		else:
+			frame_ls += range(frRange[0], frRange[1]+1)
+
+	return range_ls, frame_ls
+
+
+def parseFrameList(expr):
+	""" Parse a frame list expression into a sorted list of frames. The
+		expression is a comma-separated list of single frames, inclusive
+		ranges and stepped ranges, e.g. '1001-1040,1062,1100-1180x2'.
+		Raises ValueError if the expression is invalid or empty.
+	"""
+	frames = set()
+	for item in expr.split(','):
+		if not item.strip():
+			continue
+		match = FRAME_LIST_ITEM.match(item)
+		if not match:
+			raise ValueError("Invalid frame list item: '%s'" %item.strip())
+		start = int(match.group(1))
+		end = int(match.group(2)) if match.group(2) else start
+		step = int(match.group(3)) if match.group(3) else 1
+		if end < start or step < 1:
+			raise ValueError("Invalid frame list item: '%s'" %item.strip())
+		frames.update(range(start, end+1, step))
+
+	if not frames:
+		raise ValueError("Frame list is empty")
+
+	return sorted(frames)
+
+
+def formatFrameList(frames):
+	""" Return a compact frame list expression for a list of frames, e.g.
+		'1001-1040,1062'.
+	"""
+	item_ls = []
+	for start, end in groupFrames(frames):
+		if start == end:
+			item_ls.append(str(start))
+		else:
+			item_ls.append('%d-%d' %(start, end))
+
+	return ','.join(item_ls)
+
+
+def stepFrames(frames, start, step):
+	""" Return the frames which fall on every 'step'th frame counting from
+		'start'.
+	"""
+	return [frame for frame in frames if (frame - start) % step == 0]
+
+
+def heldFrames(frRange, step):
+	""" Return a list of (frame, source) tuples for the frames in the range
+		which are skipped by the step, where 'source' is the last rendered
+		frame before each one.
+	"""
+	held_ls = []
+	for frame in range(frRange[0], frRange[1]+1):
+		offset = (frame - frRange[0]) % step
+		if offset:
+			held_ls.append((frame, frame - offset))
+	return held_ls
+
+
+# ----------------------------------------------------------------------------
+# Sequence paths
+# ----------------------------------------------------------------------------
+
+def sequencePath(directory, name, ext, padding=4):
+	""" Return the path to an image sequence using hashes in place of the
+		frame number, matching the value returned by Maya's playblast
+		command, e.g. '/path/to/name.####.jpg'.
+	"""
+	return os.path.join(directory, '%s.%s.%s' %(name, '#'*padding, ext))
+
+
+def framePath(directory, name, ext, frame, padding=4):
+	""" Return the path to a single frame of an image sequence.
+	"""
+	return os.path.join(directory, '%s.%s.%s' %(name, str(int(frame)).zfill(padding), ext))
+
+
+def listFiles(directory):
+	""" Return a list of (filename, size, mtime) tuples for the files in a
+		directory, listing the directory in a single pass. scandir is used
+		where available, as it avoids a separate round trip per file on some
+		platforms and network filesystems.
+	"""
+	file_ls = []
+	try:
+		if scandir is not None:
+			for entry in scandir(directory):
+				if entry.is_file():
+					stat = entry.stat()
+					file_ls.append((entry.name, stat.st_size, stat.st_mtime))
+		else:
+			for filename in os.listdir(directory):
+				path = os.path.join(directory, filename)
+				if os.path.isfile(path):
+					stat = os.stat(path)
+					file_ls.append((filename, stat.st_size, stat.st_mtime))
+	except OSError:
+		return []
+
+	return file_ls
+
+
+def scanSequence(directory, name, ext):
+	""" Find the frames of an image sequence which exist on disk. Returns a
+		dictionary mapping each frame number to a tuple (path, size, mtime).
+	"""
+	pattern = re.compile(r'^%s\.(\d+)\.%s$' %(re.escape(name), re.escape(ext)))
+
+	frame_dict = {}
+	for filename, size, mtime in listFiles(directory):
+		match = pattern.match(filename)
+		if match:
+			frame_dict[int(match.group(1))] = (os.path.join(directory, filename), size, mtime)
+
+	return frame_dict
+
+
+def isComplete(path, ext, size=None):
+	""" Check whether an image file appears to have been written completely,
+		i.e. it is not empty and ends with the trailer expected for its type.
+		Only the last few bytes of the file are read.
+	"""
+	if size is None:
+		size = os.path.getsize(path)
+	if size == 0:
+		return False
+
+	trailer = TRAILERS.get(ext.lower())
+	if trailer is None:  # Format has no trailer we can check
+		return True
+
+	with open(path, 'rb') as f:
+		f.seek(max(0, size-len(trailer)))
+		return f.read() == trailer
+
+
+def linkFile(src, dst):
+	""" Make 'dst' a hard link to 'src', replacing any existing file. Falls
+		back to copying the file where hard links aren't supported.
+	"""
+	if os.path.isfile(dst):
+		os.remove(dst)
+	try:
+		os.link(src, dst)
+	except (AttributeError, OSError):  # No os.link on Windows in Python 2
+		shutil.copy2(src, dst)
@@ -0,0 +1,211 @@
+#!/usr/bin/python
+
+# timing.py
+#
+# Mike Bonnington <mjbonnington@gmail.com>
+# (c) 2019
+#
+# Capture timing for u-preview.
+# Records how long each frame of a playblast takes to capture and summarises
+# the results, so slow shots and frame spans can be identified. This module
+# has no application-specific dependencies.
+
+
+import json
+import time
+
+
+def percentile(value_ls, pct):
+	""" Return the given percentile (0-100) of a list of numbers, using
+		linear interpolation between the closest ranks.
+	"""
+	if not value_ls:
+		return 0.0
+	value_ls = sorted(value_ls)
+	rank = (len(value_ls) - 1) * pct / 100.0
+	lower = int(rank)
+	upper = min(lower + 1, len(value_ls) - 1)
+	return value_ls[lower] + (value_ls[upper] - value_ls[lower]) * (rank - lower)
+
+
+# ----------------------------------------------------------------------------
+# Main class
+# ----------------------------------------------------------------------------
+
+class FrameTimer(object):
+	""" Time the capture of each frame.
+		mark() is called as each frame starts. A frame's time runs until the
+		next frame is marked or the timer is flushed at the end of a capture,
+		so time between captures isn't counted. Frames marked more than once,
+		e.g. when capturing several cameras, accumulate their times.
+	"""
+	def __init__(self):
+		self.frame_dict = {}
+		self.pending = None
+		self.startTime = None
+		self.endTime = None
+
+
+	def start(self):
+		""" Start timing the whole playblast.
+		"""
+		self.startTime = time.time()
+
+
+	def mark(self, frame):
+		""" Start timing the given frame, ending the previous one.
+		"""
+		now = time.time()
+		if self.pending and self.pending[0] == frame:
+			return
+		self.flush(now)
+		self.pending = (frame, now)
+
+
+	def flush(self, now=None):
+		""" End the timing of the current frame.
+		"""
+		if self.pending:
+			frame, startTime = self.pending
+			self.add(frame, (now or time.time()) - startTime)
+			self.pending = None
+
+
+	def add(self, frame, seconds):
+		""" Add time taken for a frame, e.g. from a worker process's report.
+		"""
+		self.frame_dict[frame] = self.frame_dict.get(frame, 0.0) + seconds
+
+
+	def finish(self):
+		""" Stop timing the whole playblast.
+		"""
+		self.flush()
+		self.endTime = time.time()
+
+
+	def report(self, slowest=10):
+		""" Return a dictionary summarising the timings: the total wall time,
+			the number of frames captured, the mean and percentile frames per
+			second, and the slowest frames.
+		"""
+		frame_ls = sorted(self.frame_dict.items())
+		captureTime = sum(seconds for frame, seconds in frame_ls)
+		fps_ls = [1.0 / seconds for frame, seconds in frame_ls if seconds > 0]
+
+		report = {}
+		report['total_time'] = (self.endTime or time.time()) - (self.startTime or time.time())
+		report['capture_time'] = captureTime
+		report['frames'] = len(frame_ls)
+		report['mean_fps'] = len(frame_ls) / captureTime if captureTime else 0.0
+		report['fps_percentiles'] = dict(('p%d' %pct, percentile(fps_ls, pct)) for pct in (5, 50, 95))
+		report['slowest_frames'] = sorted(frame_ls, key=lambda item: item[1], reverse=True)[:slowest]
+		report['frame_times'] = frame_ls
+		return report
+
+
+	def write(self, path, report=None):
+		""" Write the report to a JSON file. Returns the report.
+		"""
+		if report is None:
+			report = self.report()
+		try:
+			with open(path, 'w') as f:
+				json.dump(report, f, indent=4)
+		except (IOError, OSError):
+			pass
+		return report
+
+# ----------------------------------------------------------------------------
+# End of main class
+# ============================================================================
+# Stage timer class
+# ----------------------------------------------------------------------------
+
+class StageTimer(object):
+	""" Time the stages of a playblast, e.g. setup, capture, restore and
+		post-processing. Starting a stage ends the current one. Stages
+		started more than once accumulate their times.
+	"""
+	def __init__(self):
+		self.stage_dict = {}
+		self.current = None
+
+
+	def start(self, stage):
+		""" End the current stage and start timing the given one.
+		"""
+		now = time.time()
+		self.stop(now)
+		self.current = (stage, now)
+
+
+	def stop(self, now=None):
+		""" End the current stage.
+		"""
+		if self.current:
+			stage, startTime = self.current
+			self.stage_dict[stage] = self.stage_dict.get(stage, 0.0) + (now or time.time()) - startTime
+			self.current = None
+
+
+	def report(self):
+		""" Return a dictionary of the seconds spent in each stage, ending
+			the current stage.
+		"""
+		self.stop()
+		return dict(self.stage_dict)
+
+# ----------------------------------------------------------------------------
+# End of stage timer class
+# ============================================================================
+# Progress timer class
+# ----------------------------------------------------------------------------
+
+class ProgressTimer(object):
+	""" Track the progress of a playblast through a number of frames, and
+		estimate the capture rate and the time remaining.
+	"""
+	def __init__(self, total):
+		self.total = total
+		self.done = 0
+		self.startTime = time.time()
+
+
+	def update(self, done):
+		""" Set the number of frames done.
+		"""
+		self.done = done
+
+
+	def fps(self, now=None):
+		""" Return the average number of frames captured per second.
+		"""
+		elapsed = (now or time.time()) - self.startTime
+		if elapsed <= 0:
+			return 0.0
+		return self.done / elapsed
+
+
+	def eta(self, now=None):
+		""" Return the estimated seconds remaining, or None if nothing has
+			been captured yet.
+		"""
+		fps = self.fps(now)
+		if not fps:
+			return None
+		return max(self.total - self.done, 0) / fps
+
+
+	def status(self, now=None):
+		""" Return a short description of the progress, e.g.
+			"40 of 100 frames, 12.5 fps, 5s remaining".
+		"""
+		eta = self.eta(now)
+		if eta is None:
+			return "%d of %d frames" %(self.done, self.total)
+		return "%d of %d frames, %.1f fps, %ds remaining" %(self.done, self.total, self.fps(now), int(round(eta)))
+
+# ----------------------------------------------------------------------------
+# End of progress timer class
+# ----------------------------------------------------------------------------
@@ -22,6 +22,10 @@ from Qt import QtCore, QtGui, QtWidgets
 import ui_template as UI
 
 import appConnect
+import nametemplate
+import sequence
+import timing
+from result import PlayblastResult
 #import verbose
 #from u_vfx.u_publish.u_daily import dailyFromApp
 #from u_vfx.core import Launch
@@ -47,11 +51,64 @@ cfg['stylesheet'] = "style.qss"  # Set to None to use the parent app's styleshee
 cfg['prefs_file'] = os.path.join(os.environ['PREVIEW_USER_PREFS_LOCAL_PATH'], 'preview_prefs.json')
 cfg['store_window_geometry'] = True
 
+# Width of thumbnail-size output sequences
+THUMBNAIL_WIDTH = 320
+
+# Interval between checks on background playblasts in milliseconds
+BACKGROUND_POLL_INTERVAL = 500
+
+# Delay after typing before the output name is checked in milliseconds
+FILENAME_CHECK_DELAY = 250
+
+# Camera filters listed before the namespaces containing cameras
+CAMERA_FILTERS = ["All cameras", "Local cameras", "Referenced cameras"]
+
+# User input events blocked while a playblast is captured in this session
+INPUT_EVENTS = (QtCore.QEvent.MouseButtonPress, 
+                QtCore.QEvent.MouseButtonRelease, 
+                QtCore.QEvent.MouseButtonDblClick, 
+                QtCore.QEvent.MouseMove, 
+                QtCore.QEvent.Wheel, 
+                QtCore.QEvent.KeyPress, 
+                QtCore.QEvent.KeyRelease, 
+                QtCore.QEvent.Shortcut, 
+                QtCore.QEvent.ShortcutOverride, 
+                QtCore.QEvent.ContextMenu, 
+                QtCore.QEvent.DragEnter, 
+                QtCore.QEvent.Drop, 
+                QtCore.QEvent.TabletPress, 
+                QtCore.QEvent.TouchBegin)
+
 # DOCK_WITH_MAYA_UI = False
 # DOCK_WITH_NUKE_UI = False
 
 
 # ----------------------------------------------------------------------------
+# Input filter class
+# ----------------------------------------------------------------------------
+
+class CaptureInputFilter(QtCore.QObject):
+	""" Application event filter which blocks user input to every widget
+		except the cancel button. Installed while a playblast is captured,
+		as events are processed between chunks of frames with undo
+		suspended, so any edit to the scene would be captured in the
+		playblast and couldn't be undone.
+	"""
+	def __init__(self, allowed, parent=None):
+		super(CaptureInputFilter, self).__init__(parent)
+		self.allowed = allowed
+
+
+	def eventFilter(self, obj, event):
+		""" Return True to block the event.
+		"""
+		if event.type() in INPUT_EVENTS:
+			return obj is not self.allowed
+		return False
+
+# ----------------------------------------------------------------------------
+# End of input filter class
+# ============================================================================
 # Begin main window class
 # ----------------------------------------------------------------------------
 
@@ -72,27 +129,62 @@ class PreviewUI(QtWidgets.QMainWindow, UI.TemplateUI):
 		# Set icons
 		self.ui.nameUpdate_toolButton.setIcon(self.iconSet('configure.svg'))
 
+		# Check the output name once typing pauses, resolving tokens from a
+		# snapshot of the scene rather than querying it on every keystroke
+		self.sceneSnapshot = None
+		self.nameTemplate = None
+		self.filenameTimer = QtCore.QTimer(self)
+		self.filenameTimer.setSingleShot(True)
+		self.filenameTimer.setInterval(FILENAME_CHECK_DELAY)
+		self.filenameTimer.timeout.connect(self.checkFilename)
+
 		# Connect signals & slots
-		self.ui.name_lineEdit.textChanged.connect(self.checkFilename)
+		self.ui.name_lineEdit.textChanged.connect(self.scheduleCheckFilename)
 		#self.ui.nameUpdate_toolButton.clicked.connect(self.updateFilename)
 		self.ui.format_comboBox.currentIndexChanged.connect(self.setCreateDaily)
 		self.ui.camera_radioButton.toggled.connect(self.updateCameras)
+		self.ui.camera_radioButton.toggled.connect(self.invalidateSceneSnapshot)
+		self.ui.camera_comboBox.currentIndexChanged.connect(self.invalidateSceneSnapshot)
+		self.ui.cameraFilter_comboBox.currentIndexChanged.connect(self.updateCameras)
+		self.ui.renderableCameras_radioButton.toggled.connect(self.invalidateSceneSnapshot)
 		self.ui.resolution_comboBox.currentIndexChanged.connect(self.updateResGrp)
 		self.ui.x_spinBox.valueChanged.connect(self.storeRes)
 		self.ui.y_spinBox.valueChanged.connect(self.storeRes)
+		self.ui.resolution_comboBox.currentIndexChanged.connect(self.scheduleCheckFilename)  # For <Res>
+		self.ui.x_spinBox.valueChanged.connect(self.scheduleCheckFilename)
+		self.ui.y_spinBox.valueChanged.connect(self.scheduleCheckFilename)
 		self.ui.range_comboBox.currentIndexChanged.connect(self.updateRangeGrp)
 		self.ui.start_spinBox.valueChanged.connect(self.storeRangeStart)
 		self.ui.end_spinBox.valueChanged.connect(self.storeRangeEnd)
 		self.ui.preview_pushButton.clicked.connect(self.preview)
+		self.ui.cancel_pushButton.clicked.connect(self.cancelPreview)
 
 		# Context menus
 		self.addContextMenu(self.ui.nameUpdate_toolButton, "Reset to default", self.updateFilename)
 		self.addContextMenu(self.ui.nameUpdate_toolButton, "Insert scene name token <Scene>", lambda: self.insertFilenameToken("<Scene>"))
 		self.addContextMenu(self.ui.nameUpdate_toolButton, "Insert camera name token <Camera>", lambda: self.insertFilenameToken("<Camera>"))
+		self.addContextMenu(self.ui.nameUpdate_toolButton, "Insert shot token <Shot>", lambda: self.insertFilenameToken("<Shot>"))
+		self.addContextMenu(self.ui.nameUpdate_toolButton, "Insert date token <Date>", lambda: self.insertFilenameToken("<Date>"))
+		self.addContextMenu(self.ui.nameUpdate_toolButton, "Insert user token <User>", lambda: self.insertFilenameToken("<User>"))
+		self.addContextMenu(self.ui.nameUpdate_toolButton, "Insert resolution token <Res>", lambda: self.insertFilenameToken("<Res>"))
+		self.addContextMenu(self.ui.nameUpdate_toolButton, "Insert version token <Version>", lambda: self.insertFilenameToken("<Version>"))
+
+		# Poll background playblasts for progress
+		self.background_ls = []  # (worker, options) tuples
+		self.backgroundTimer = QtCore.QTimer(self)
+		self.backgroundTimer.setInterval(BACKGROUND_POLL_INTERVAL)
+		self.backgroundTimer.timeout.connect(self.pollBackground)
+
+		# The playblast running in this session, and its progress
+		self.currentPreview = None
+		self.progressTimer = None
+		self.inputFilter = CaptureInputFilter(self.ui.cancel_pushButton, self)
 
 		# Set input validators
 		alphanumeric_validator = QtGui.QRegExpValidator(QtCore.QRegExp(r'[\w<>]+'), self.ui.name_lineEdit) #r'[\w\.-]+'
 		self.ui.name_lineEdit.setValidator(alphanumeric_validator)
+		frameList_validator = QtGui.QRegExpValidator(QtCore.QRegExp(r'[\d\s,x-]*'), self.ui.frameList_lineEdit)
+		self.ui.frameList_lineEdit.setValidator(frameList_validator)
 
 		# Show initialisation message
 		info_ls = []
@@ -121,13 +213,16 @@ class PreviewUI(QtWidgets.QMainWindow, UI.TemplateUI):
 		self.activeView = self.prefs.getValue('preview', 'activeview') #None
 		# self.ui.activeView_lineEdit.hide()
 		self.ui.message_plainTextEdit.hide()
+		self.ui.progress_progressBar.hide()
+		self.ui.cancel_pushButton.hide()
 		#self.setFixedHeight(self.minimumSizeHint().height())
 
 		if not self.ui.name_lineEdit.text():
 			self.updateFilename()
-		# self.updateCameras()
+		self.updateCameras()
 		self.updateResGrp()
 		self.updateRangeGrp()
+		self.sceneSnapshot = None
 		self.checkFilename()
 
 
@@ -135,7 +230,7 @@ class PreviewUI(QtWidgets.QMainWindow, UI.TemplateUI):
 		""" Update filename field.
 		"""
 		# Add camera token only if multiple renderable cameras found
-		if len(appConnect.getCameras(renderableOnly=True)) > 1:
+		if len(appConnect.getCameras(renderableOnly=True, **self.getCameraFilter())) > 1:
 			filename = "<Scene>_<Camera>"
 		else:
 			filename = "<Scene>"
@@ -149,9 +244,9 @@ class PreviewUI(QtWidgets.QMainWindow, UI.TemplateUI):
 
 
 	def setCreateDaily(self):
-		""" Disable dailies creation if format is set to QuickTime movie.
+		""" Disable dailies creation if format is set to a movie.
 		"""
-		if self.sender().currentText() == "QuickTime":
+		if self.sender().currentText() in ("QuickTime", "MPEG-4 (ffmpeg)"):
 			#self.createDailyTemp = self.createDaily
 			self.ui.createDaily_checkBox.setCheckState(QtCore.Qt.Unchecked)
 			self.ui.createDaily_checkBox.setEnabled(False)
@@ -173,7 +268,29 @@ class PreviewUI(QtWidgets.QMainWindow, UI.TemplateUI):
 			#verbose.warning("Using active view %s" %self.activeView)
 			print("Using active view %s" %self.activeView)
 
-		self.populateComboBox(self.ui.camera_comboBox, appConnect.getCameras())
+		# List the namespaces containing cameras after the fixed filters
+		self.ui.cameraFilter_comboBox.blockSignals(True)
+		self.populateComboBox(self.ui.cameraFilter_comboBox, 
+			CAMERA_FILTERS + appConnect.getCameraNamespaces())
+		self.ui.cameraFilter_comboBox.blockSignals(False)
+
+		self.populateComboBox(self.ui.camera_comboBox, 
+			appConnect.getCameras(**self.getCameraFilter()))
+		self.sceneSnapshot = None
+
+
+	def getCameraFilter(self):
+		""" Return the camera filter as keyword arguments for
+			appConnect.getCameras().
+		"""
+		cameraFilter = self.ui.cameraFilter_comboBox.currentText()
+		if cameraFilter == "Local cameras":
+			return {'referenced': False}
+		elif cameraFilter == "Referenced cameras":
+			return {'referenced': True}
+		elif cameraFilter and cameraFilter not in CAMERA_FILTERS:
+			return {'namespace': cameraFilter}
+		return {}
 
 
 	def updateResGrp(self):
@@ -213,13 +330,7 @@ class PreviewUI(QtWidgets.QMainWindow, UI.TemplateUI):
 			if resMode == "Shot default":
 				res = int(os.environ['PREVIEW_RESOLUTION_X']), int(os.environ['PREVIEW_RESOLUTION_Y'])
 			elif resMode == "Proxy":
-				try:
-					proxy_scale = float(os.environ['PREVIEW_PROXY_SCALE'])
-				except:
-					proxy_scale = 0.5
-				resX = float(os.environ['PREVIEW_RESOLUTION_X']) * proxy_scale
-				resY = float(os.environ['PREVIEW_RESOLUTION_Y']) * proxy_scale
-				res = int(resX), int(resY)
+				res = self.getProxyResolution()
 				#res = int(os.environ['PROXY_RESOLUTIONX']), int(os.environ['PROXY_RESOLUTIONY'])
 			elif resMode == "Render settings":
 				res = appConnect.getResolution()
@@ -281,6 +392,17 @@ class PreviewUI(QtWidgets.QMainWindow, UI.TemplateUI):
 				frame = appConnect.getCurrentFrame()
 				frRange = frame, frame
 
+		# Show the frame list field in place of the start and end frames
+		frameListMode = rangeMode == "Frame list"
+		self.ui.frameList_lineEdit.setVisible(frameListMode)
+		self.ui.start_spinBox.setVisible(not frameListMode)
+		self.ui.rangeSep_label.setVisible(not frameListMode)
+		self.ui.end_spinBox.setVisible(not frameListMode)
+
+		# Frame step has no effect on a single frame, and frame lists have
+		# their own step syntax
+		self.ui.step_spinBox.setEnabled(rangeMode not in ("Current frame only", "Frame list"))
+
 		# Update widgets
 		self.ui.start_spinBox.setValue(frRange[0])
 		self.ui.end_spinBox.setValue(frRange[1])
@@ -291,16 +413,65 @@ class PreviewUI(QtWidgets.QMainWindow, UI.TemplateUI):
 
 
 	# @QtCore.Slot()
+	def getSceneSnapshot(self):
+		""" Return the scene name, camera and playblasts directory used to
+			resolve the tokens in the output name. They're cached until the
+			camera options change, so checking the name doesn't need to query
+			the scene.
+		"""
+		if self.sceneSnapshot is None:
+			if self.ui.renderableCameras_radioButton.isChecked():
+				camera = "multicam"  # Each camera gets its own subdirectory
+			elif self.ui.camera_radioButton.isChecked():
+				camera = self.ui.camera_comboBox.currentText()
+			else:
+				camera = appConnect.getActiveCamera(self.activeView)
+
+			self.sceneSnapshot = {}
+			self.sceneSnapshot['scene'] = appConnect.getScene()
+			self.sceneSnapshot['camera'] = camera or ""
+			self.sceneSnapshot['playblastsDir'] = appConnect.getPlayblastsDir()
+
+		return self.sceneSnapshot
+
+
+	def invalidateSceneSnapshot(self):
+		""" Discard the scene snapshot and check the output name again once
+			the options have settled.
+		"""
+		self.sceneSnapshot = None
+		self.scheduleCheckFilename()
+
+
+	def scheduleCheckFilename(self, *args):
+		""" Check the output name once the options have settled. Signal
+			arguments are ignored, so they can't be taken as the timer's
+			interval.
+		"""
+		self.filenameTimer.start()
+
+
 	def checkFilename(self):
 		""" Check custom output filename and adjust UI appropriately.
 		"""
-		filename = self.ui.name_lineEdit.text()
-		camera = self.getCurrentCamera()
+		self.filenameTimer.stop()
+		pattern = self.ui.name_lineEdit.text()
+		snapshot = self.getSceneSnapshot()
 
-		# Replace tokens and remove invalid characters...
-		#filename = filename.replace('<Scene>', self.sanitize(appConnect.getScene(), pattern=r"[^\w]", replace="_"))
-		filename = filename.replace('<Scene>', appConnect.getScene())
-		filename = filename.replace('<Camera>', camera)
+		# Resolve tokens with the compiled template, which is only compiled
+		# again when the pattern changes
+		try:
+			if self.nameTemplate is None or self.nameTemplate.pattern != pattern:
+				self.nameTemplate = nametemplate.NameTemplate(pattern)
+			context = nametemplate.getContext(
+				snapshot['scene'], snapshot['camera'], 
+				(self.ui.x_spinBox.value(), self.ui.y_spinBox.value()))
+			index = nametemplate.getVersionIndex(snapshot['playblastsDir'])
+			filename = self.nameTemplate.expand(context, index)
+			msg = ""
+		except ValueError as e:
+			filename = ""
+			msg = str(e)
 
 		#if filename and filename == self.sanitize(filename): # and camera:
 		if filename:
@@ -311,7 +482,7 @@ class PreviewUI(QtWidgets.QMainWindow, UI.TemplateUI):
 			#self.setFixedHeight(self.minimumSizeHint().height())
 			return filename
 		else:
-			msg = "Invalid output name."
+			msg = msg or "Invalid output name."
 			#verbose.warning(msg)
 			self.ui.preview_pushButton.setEnabled(False)
 			self.ui.message_plainTextEdit.setPlainText(msg)
@@ -329,6 +500,31 @@ class PreviewUI(QtWidgets.QMainWindow, UI.TemplateUI):
 		self.storeValue('preview', 'customresolution', res)
 
 
+	def getProxyResolution(self):
+		""" Return the proxy resolution for the shot.
+		"""
+		try:
+			proxy_scale = float(os.environ['PREVIEW_PROXY_SCALE'])
+		except:
+			proxy_scale = 0.5
+		resX = float(os.environ['PREVIEW_RESOLUTION_X']) * proxy_scale
+		resY = float(os.environ['PREVIEW_RESOLUTION_Y']) * proxy_scale
+		return int(resX), int(resY)
+
+
+	def getResizeOutputs(self):
+		""" Return a list of (name, (width, height)) tuples for the extra
+			output resolutions to make from the captured frames.
+		"""
+		resizeOutputs = []
+		if self.getCheckBoxValue(self.ui.proxyOutput_checkBox):
+			resizeOutputs.append(('proxy', self.getProxyResolution()))
+		if self.getCheckBoxValue(self.ui.thumbnailOutput_checkBox):
+			height = int(round(THUMBNAIL_WIDTH * float(self.res[1]) / self.res[0]))
+			resizeOutputs.append(('thumbnail', (THUMBNAIL_WIDTH, height + height%2)))
+		return resizeOutputs
+
+
 	# @QtCore.Slot()
 	def storeRangeStart(self):
 		""" Store custom frame range in user prefs.
@@ -364,11 +560,16 @@ class PreviewUI(QtWidgets.QMainWindow, UI.TemplateUI):
 
 
 	def getCurrentCamera(self):
-		""" Get the current camera to playblast from.
+		""" Get the current camera to playblast from. The camera list and
+			active view should be updated first.
 		"""
-		self.updateCameras()
 		if self.ui.camera_radioButton.isChecked():
 			return self.ui.camera_comboBox.currentText()
+		elif self.ui.renderableCameras_radioButton.isChecked():
+			try:
+				return appConnect.getCameras(renderableOnly=True, **self.getCameraFilter())[0]
+			except IndexError:
+				return ""
 		else:
 			#print(self.activeView)
 			return appConnect.getActiveCamera(self.activeView)
@@ -378,7 +579,10 @@ class PreviewUI(QtWidgets.QMainWindow, UI.TemplateUI):
 		""" Get UI options before generating playblast.
 		"""
 		try:
-			# Get file name output string
+			# Get file name output string, using an up-to-date snapshot of
+			# the scene
+			self.updateCameras()
+			self.sceneSnapshot = None
 			self.fileInput = self.checkFilename() #self.ui.name_lineEdit.text()
 
 			# Get file format
@@ -388,11 +592,23 @@ class PreviewUI(QtWidgets.QMainWindow, UI.TemplateUI):
 			# self.updateCameras()
 			# self.activeView = self.ui.activeView_lineEdit.text()
 			self.camera = self.getCurrentCamera()
+			if self.ui.renderableCameras_radioButton.isChecked():
+				self.cameras = appConnect.getCameras(renderableOnly=True, **self.getCameraFilter())
+			else:
+				self.cameras = None
 
 			# Get frame range and resolution
 			self.updateRangeGrp()
 			self.res = self.ui.x_spinBox.value(), self.ui.y_spinBox.value()
 			self.frRange = self.ui.start_spinBox.value(), self.ui.end_spinBox.value()
+			self.frameStep = self.ui.step_spinBox.value()
+			if self.ui.range_comboBox.currentText() == "Frame list":
+				self.frameList = self.ui.frameList_lineEdit.text()
+				frame_ls = sequence.parseFrameList(self.frameList)  # Validate
+				self.frRange = frame_ls[0], frame_ls[-1]
+				self.frameStep = 1
+			else:
+				self.frameList = None
 
 			# Get option values from checkboxes
 			self.offscreen = self.getCheckBoxValue(self.ui.offscreen_checkBox)
@@ -401,11 +617,31 @@ class PreviewUI(QtWidgets.QMainWindow, UI.TemplateUI):
 			self.burnin = self.getCheckBoxValue(self.ui.burnin_checkBox)
 			self.viewer = self.getCheckBoxValue(self.ui.launchViewer_checkBox)
 			self.createDaily = self.getCheckBoxValue(self.ui.createDaily_checkBox)
+			self.processes = self.ui.processes_spinBox.value()
+			self.resume = self.getCheckBoxValue(self.ui.resume_checkBox)
+			self.incremental = self.getCheckBoxValue(self.ui.incremental_checkBox)
+			if self.getCheckBoxValue(self.ui.postBurnin_checkBox):
+				self.burninMode = 'post'
+			else:
+				self.burninMode = 'hud'
+			self.viewportProfile = self.ui.viewportProfile_comboBox.currentText()
+			self.resizeOutputs = self.getResizeOutputs()
+			if self.ui.capture_comboBox.currentText() == "Viewport to memory":
+				self.captureBackend = 'memory'
+			else:
+				self.captureBackend = 'playblast'
+			self.memoryLimit = self.ui.memoryLimit_spinBox.value()
+			self.background = self.getCheckBoxValue(self.ui.background_checkBox)
 			self.interruptible = True
 			# self.interruptible = self.getCheckBoxValue(self.ui.interruptible_checkBox)
 
 			return True
 
+		except ValueError as e:  # Invalid frame list
+			self.ui.message_plainTextEdit.setPlainText(str(e))
+			self.ui.message_plainTextEdit.show()
+			return False
+
 		except:
 			return False
 
@@ -416,7 +652,7 @@ class PreviewUI(QtWidgets.QMainWindow, UI.TemplateUI):
 		"""
 		if self.getOpts():
 			# Minimise window if rendering offscreen
-			if not self.offscreen and showUI:
+			if not self.offscreen and not self.background and showUI:
 				self.showMinimized()
 
 			previewSetup = appConnect.AppConnect(fileInput=self.fileInput, 
@@ -429,50 +665,201 @@ class PreviewUI(QtWidgets.QMainWindow, UI.TemplateUI):
 			                                     noSelect=self.noSelect, 
 			                                     guides=self.guides, 
 			                                     burnin=self.burnin, 
-			                                     interruptible=self.interruptible)
-			previewOutput = previewSetup.appPreview()
-			if previewOutput[0] == "Completed":  # Playblast completed without interruption
-				# print(previewOutput[1])
-				outputFilePath = previewOutput[1]
-				if self.viewer:
-					self.launchViewer(outputFilePath)
-				if self.createDaily:
-					self.makeDaily(outputFilePath)
-				self.ui.message_plainTextEdit.hide()
-				#self.setFixedHeight(self.minimumSizeHint().height())
-			elif previewOutput[0] == "Interrupted":  # Playblast interrupted
-				# print(previewOutput[1])
-				outputFilePath = previewOutput[1]
-				if self.viewer:
-					self.launchViewer(outputFilePath)
-				self.ui.message_plainTextEdit.hide()
-				#self.setFixedHeight(self.minimumSizeHint().height())
-			else:  # Playblast failed
-				self.ui.message_plainTextEdit.setPlainText(previewOutput[1])
-				self.ui.message_plainTextEdit.show()
-				#self.setFixedHeight(self.minimumSizeHint().height())
+			                                     interruptible=self.interruptible, 
+			                                     processes=self.processes, 
+			                                     resume=self.resume, 
+			                                     incremental=self.incremental, 
+			                                     cameras=self.cameras, 
+			                                     burninMode=self.burninMode, 
+			                                     viewportProfile=self.viewportProfile, 
+			                                     frameStep=self.frameStep, 
+			                                     frameList=self.frameList, 
+			                                     resizeOutputs=self.resizeOutputs, 
+			                                     captureBackend=self.captureBackend, 
+			                                     memoryLimit=self.memoryLimit, 
+			                                     background=self.background)
+
+			# Capture in chunks, showing the progress and checking the
+			# cancel button in between. Only worth it if the window can be
+			# seen, as on-screen playblasts minimise it.
+			self.currentPreview = previewSetup.createPreview()
+			if showUI and self.offscreen and not self.background:
+				self.currentPreview.chunkProgress = self.updateProgress
+			try:
+				previewOutput = self.currentPreview.playblast_()
+			finally:
+				self.currentPreview = None
+				self.hideProgress()
+
+			if previewOutput.status == "Started":  # Playblast running in background
+				self.background_ls.append((previewOutput.worker, self.getResultOptions()))
+				self.backgroundTimer.start()
+				self.showProgress()
+			else:
+				self.handleResult(previewOutput)
 
 			# Restore window
-			if not self.offscreen and showUI:
+			if not self.offscreen and not self.background and showUI:
 				self.showNormal()
 
 		self.save()  # Save settings
 
 
-	def launchViewer(self, outputFilePath):
+	def getResultOptions(self):
+		""" Return the options used to handle a playblast's result, so
+			background playblasts can be handled with the options they were
+			started with.
+		"""
+		options = {}
+		options['viewer'] = self.viewer
+		options['createDaily'] = self.createDaily
+		options['outputFormat'] = self.outputFormat
+		return options
+
+
+	def handleResult(self, previewOutput, options=None):
+		""" Launch the viewer and create dailies for the playblast output,
+			or show a message if the playblast failed. 'options' are the
+			options from getResultOptions() when the playblast was started,
+			otherwise the current options are used.
+		"""
+		if options is None:
+			options = self.getResultOptions()
+
+		# Log the size of the output and where the time went
+		if previewOutput.frames:
+			timings = ", ".join("%s %.1fs" %(stage, previewOutput.timings[stage]) for stage in PlayblastResult.STAGES if stage in previewOutput.timings)
+			print("Wrote %d frames (%.1f MB). Time taken: %s" %(len(previewOutput.frames), previewOutput.bytes / 1048576.0, timings))
+
+		if previewOutput.status == "Completed":  # Playblast completed without interruption
+			# print(previewOutput.path)
+			for outputFilePath in self.getOutputPaths(previewOutput.path):
+				if options['viewer']:
+					self.launchViewer(outputFilePath, options['outputFormat'])
+				if options['createDaily']:
+					self.makeDaily(outputFilePath, options['outputFormat'])
+			self.ui.message_plainTextEdit.hide()
+			#self.setFixedHeight(self.minimumSizeHint().height())
+		elif previewOutput.status == "Interrupted":  # Playblast interrupted
+			# print(previewOutput.path)
+			for outputFilePath in self.getOutputPaths(previewOutput.path):
+				if options['viewer']:
+					self.launchViewer(outputFilePath, options['outputFormat'])
+			if previewOutput.frames:
+				msg = "Playblast interrupted. Frames written: %s" %sequence.formatFrameList(previewOutput.frames)
+			else:
+				msg = "Playblast interrupted. No frames were written."
+			if previewOutput.message:
+				msg = "%s\n%s" %(previewOutput.message, msg)
+			self.ui.message_plainTextEdit.setPlainText(msg)
+			self.ui.message_plainTextEdit.show()
+			#self.setFixedHeight(self.minimumSizeHint().height())
+		else:  # Playblast failed
+			self.ui.message_plainTextEdit.setPlainText(previewOutput.message)
+			self.ui.message_plainTextEdit.show()
+			#self.setFixedHeight(self.minimumSizeHint().height())
+
+
+	def updateProgress(self, done, total):
+		""" Show the progress of the playblast in this session. Called by
+			the preview object before the first chunk of frames and after
+			each one, so this is also where clicks on the cancel button are
+			handled. Input to anything else is blocked until the playblast
+			finishes.
+		"""
+		if self.progressTimer is None:
+			QtWidgets.QApplication.instance().installEventFilter(self.inputFilter)
+			self.progressTimer = timing.ProgressTimer(total)
+			self.ui.progress_progressBar.setMaximum(max(total, 1))
+			self.ui.progress_progressBar.show()
+			self.ui.cancel_pushButton.setEnabled(True)
+			self.ui.cancel_pushButton.show()
+			self.ui.preview_pushButton.setEnabled(False)
+		self.progressTimer.update(done)
+		self.ui.progress_progressBar.setValue(done)
+		self.ui.progress_progressBar.setFormat(self.progressTimer.status())
+		QtWidgets.QApplication.processEvents()
+
+
+	def hideProgress(self):
+		""" Hide the progress bar once the playblast has finished.
+		"""
+		QtWidgets.QApplication.instance().removeEventFilter(self.inputFilter)
+		self.progressTimer = None
+		self.ui.progress_progressBar.hide()
+		self.ui.cancel_pushButton.hide()
+		self.ui.preview_pushButton.setEnabled(True)
+
+
+	def cancelPreview(self):
+		""" Stop the playblast at the end of the current chunk of frames.
+		"""
+		if self.currentPreview is not None:
+			self.currentPreview.cancel()
+			self.ui.cancel_pushButton.setEnabled(False)
+			self.ui.progress_progressBar.setFormat("Cancelling...")
+
+
+	def showProgress(self):
+		""" Show the progress of the background playblasts.
+		"""
+		msg_ls = []
+		for worker, options in self.background_ls:
+			if worker.frames:
+				msg_ls.append("Playblasting in background: %d of %d frames" %(worker.framesDone, worker.frames))
+			else:
+				msg_ls.append("Playblasting in background...")
+		self.ui.message_plainTextEdit.setPlainText("\n".join(msg_ls))
+		self.ui.message_plainTextEdit.show()
+
+
+	def pollBackground(self):
+		""" Check the background playblasts for progress, and handle the
+			results of any which have finished.
+		"""
+		for worker, options in self.background_ls[:]:
+			if worker.finished():
+				self.background_ls.remove((worker, options))
+				msg = worker.wait()
+				if msg:
+					self.handleResult(PlayblastResult.fromDict(msg), options)
+				else:
+					self.handleResult(PlayblastResult("Failed", message="Background playblast failed:\n%s" %"\n".join(worker.log[-10:])), options)
+
+		if self.background_ls:
+			self.showProgress()
+		else:
+			self.backgroundTimer.stop()
+
+
+	def getOutputPaths(self, output):
+		""" Return the playblast output as a list of paths, as multi-camera
+			playblasts return one path per camera.
+		"""
+		if isinstance(output, list):
+			return output
+		else:
+			return [output]
+
+
+	def launchViewer(self, outputFilePath, outputFormat=None):
 		""" Launch viewer.
 		"""
-		if self.outputFormat == "QuickTime":
+		if outputFormat is None:
+			outputFormat = self.outputFormat
+		if outputFormat == "QuickTime":
 			outputFilePath += ".mov"
 
 		#Launch.djvView(outputFilePath)
 
 
-	def makeDaily(self, outputFilePath):
+	def makeDaily(self, outputFilePath, outputFormat=None):
 		""" Create daily from playblast.
 		"""
-		if self.outputFormat == "QuickTime":
-			print("Warning: Cannot create dailies from QuickTime movies.")
+		if outputFormat is None:
+			outputFormat = self.outputFormat
+		if outputFormat in ("QuickTime", "MPEG-4 (ffmpeg)"):
+			print("Warning: Cannot create dailies from movies.")
 			return False
 		else:
 			# Quick hack to replace frame number padding with first frame
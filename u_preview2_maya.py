@@ -10,176 +10,507 @@
 
 
 import maya.cmds as mc
+import maya.api.OpenMaya as om
+import getpass
+import hashlib
+import json
 import os
+import shutil
+import tempfile
 import time
 
+import sequence
+import timing
+from result import PlayblastResult
+
+try:
+	import psutil
+except ImportError:
+	psutil = None
+
+
+# Frames per second for each of Maya's named time units
+FRAME_RATES = {
+	'game': 15, 
+	'film': 24, 
+	'pal': 25, 
+	'ntsc': 30, 
+	'show': 48, 
+	'palf': 50, 
+	'ntscf': 60, 
+}
+
+# Camera shape display attributes overridden during a playblast
+CAMERA_DISPLAY_ATTRS = ['displayResolution', 'displayFieldChart', 
+                        'displaySafeAction', 'displaySafeTitle', 
+                        'displayFilmPivot', 'displayFilmOrigin', 
+                        'overscan', 'panZoomEnabled']
+
+# Segment sizes in frames, and the fraction of the memory limit at which
+# caches are flushed, for playblasts with a memory limit
+SEGMENT_SIZE = 25
+MIN_SEGMENT_SIZE = 5
+MAX_SEGMENT_SIZE = 1000
+FLUSH_THRESHOLD = 0.9
+MIN_FLUSH_GAIN = 0.02  # Fraction of the memory limit a flush must free to be worth repeating
+
+# Frames captured in each chunk when progress is reported between chunks
+CHUNK_SIZE = 10
+
+# Interval between progress reports on parallel playblast workers in seconds
+WORKER_POLL_INTERVAL = 0.25
+
+# Viewport profiles, keyed by the names shown in the UI. Each profile holds
+# Viewport 2.0 render settings (attributes of hardwareRenderingGlobals) and
+# model editor flags which are overridden for the duration of the playblast.
+# Anything not listed is left as it is in the viewport.
+VIEWPORT_PROFILES = {
+	"Current settings": {}, 
+	"Fast layout": {
+		'globals': {
+			'ssaoEnable': False, 
+			'motionBlurEnable': False, 
+			'multiSampleEnable': False, 
+			'lineAAEnable': False, 
+			'enableTextureMaxRes': True, 
+			'textureMaxResolution': 256, 
+		}, 
+		'editor': {
+			'displayLights': 'default', 
+			'displayTextures': False, 
+			'shadows': False, 
+			'nurbsCurves': False, 
+			'locators': False, 
+			'imagePlane': False, 
+			'joints': False, 
+			'ikHandles': False, 
+			'deformers': False, 
+			'dynamics': False, 
+			'nParticles': False, 
+		}, 
+	}, 
+	"Lighting check": {
+		'globals': {
+			'ssaoEnable': True, 
+			'motionBlurEnable': False, 
+			'multiSampleEnable': True, 
+			'enableTextureMaxRes': False, 
+		}, 
+		'editor': {
+			'displayLights': 'all', 
+			'displayTextures': True, 
+			'shadows': True, 
+			'nurbsCurves': False, 
+			'locators': False, 
+			'imagePlane': False, 
+			'joints': False, 
+			'ikHandles': False, 
+		}, 
+	}, 
+}
+
 
 # ----------------------------------------------------------------------------
-# Main class
+# Burn-in data class
 # ----------------------------------------------------------------------------
 
-class Preview():
+class BurninData(object):
+	""" Provide the burn-in text for a playblast.
+		Static fields (header, job, artist, date & time and scene) are
+		resolved once. Camera info is only re-queried for each frame if the
+		camera attributes it depends on are animated or driven, and each
+		value is cached per frame. Every Maya command issued is counted so
+		the per-frame cost of the burn-in can be reported.
+	"""
+	# Camera shape attributes the camera info depends on
+	CAMERA_ATTRS = ('orthographic', 'orthographicWidth', 'focalLength')
+
+	def __init__(self):
+		self.calls = 0
+		self.frames = set()
+		self.camera_dict = {}
+		self.cache = {}
+
+		self.static = {}
+		self.static['header'] = "UNIT"
+		self.static['job'] = '%s - %s' %(os.environ['PREVIEW_JOB'], os.environ['PREVIEW_SHOT'])
+		self.static['artist'] = os.environ.get('USERNAME', getpass.getuser())  #IC_USERNAME
+		self.static['time'] = time.strftime("%d/%m/%Y %H:%M")
+		self.static['scene'] = os.path.split(self.call(mc.file, q=True, exn=True))[1]
+		self.setupCalls = self.calls
+
+
+	def call(self, cmd, *args, **kwargs):
+		""" Run a Maya command and count it.
+		"""
+		self.calls += 1
+		return cmd(*args, **kwargs)
 
-	def __init__(self, outputDir, outputFile, outputFormat, activeView, camera, 
-				 res, frRange, offscreen, noSelect, guides, burnin, 
-				 interruptible):
-		self.playblastDir = outputDir
-		self.outputFile = outputFile
-		if outputFormat == "QuickTime":
-			self.outputFormat = "qt"
-			self.compression = "H.264"
-			self.sound = self.getActiveAudioNode()
-		elif outputFormat == "JPEG sequence":
-			self.outputFormat = "image"
-			self.compression = "jpg"
-			self.sound = ""
-		elif outputFormat == "TIFF sequence":
-			self.outputFormat = "image"
-			self.compression = "tif"
-			self.sound = ""
-		self.activeView = activeView
-		self.camera = camera
-		self.res = (int(res[0]), int(res[1]))
-		self.frRange = (int(frRange[0]), int(frRange[1]))
-		self.offscreen = offscreen
-		self.noSelect = noSelect
-		self.guides = guides
-		self.burnin = burnin
-		self.interruptible = interruptible
+
+	def get(self, field):
+		""" Return the value of a static field.
+		"""
+		return self.static[field]
 
 
-	def storeAttributes(self, obj, attrLs):
-		""" Store the object's specified attribute values in a dictionary.
+	def frame(self):
+		""" Return the current frame.
 		"""
-		storedAttrDic = {}
-		for attr in attrLs:
-			storedAttrDic[attr] = mc.getAttr('%s.%s' %(obj, attr))
+		frame = self.call(mc.currentTime, q=True)
+		self.frames.add(frame)
+		return frame
+
+
+	def getCameraInfo(self, camera):
+		""" Find the camera's shape node, and which of the attributes the
+			camera info depends on are animated or driven. The values of the
+			other attributes are read once and stored.
+		"""
+		try:
+			return self.camera_dict[camera]
+		except KeyError:
+			pass
+
+		calls = self.calls
+		shape = camera
+		if self.call(mc.nodeType, camera) != 'camera':
+			shape = self.call(mc.listRelatives, camera, shapes=True)[0]
+
+		# Connections are returned as pairs of plugs (this node, source)
+		connection_ls = self.call(mc.listConnections, shape, source=True, destination=False, connections=True, plugs=True) or []
+		driven = set(plug.split('.', 1)[-1] for plug in connection_ls[::2])
 
-		return storedAttrDic
+		info = {'shape': shape, 'animated': [], 'values': {}}
+		for attr in self.CAMERA_ATTRS:
+			if attr in driven:
+				info['animated'].append(attr)
+			else:
+				info['values'][attr] = self.call(mc.getAttr, '%s.%s' %(shape, attr))
 
+		self.camera_dict[camera] = info
+		self.setupCalls += self.calls - calls
+		return info
 
-	def retrieveAttributes(self, obj, storedAttrDic):
-		""" Retrieve the stored attribute values in order to re-apply the
-			settings.
+
+	def camera(self, camera, frame=None):
+		""" Return the camera and lens info for the given camera at the
+			given frame, or the current frame if not specified.
 		"""
-		for attr, value in storedAttrDic.iteritems():
+		info = self.getCameraInfo(camera)
+		if info['animated']:
+			if frame is None:
+				frame = self.frame()
 			try:
-				mc.setAttr('%s.%s' %(obj, attr), value)
-			except:
-				mc.warning("Could not set attribute: %s.%s" %(obj, attr))
+				return self.cache[(camera, frame)]
+			except KeyError:
+				pass
+			value_dict = dict(info['values'])
+			for attr in info['animated']:
+				value_dict[attr] = self.call(mc.getAttr, '%s.%s' %(info['shape'], attr), time=frame)
+		else:
+			value_dict = info['values']
+		self.frames.add(frame)
 
+		if value_dict['orthographic']:
+			camInfo = '%s (ortho %s)' %(camera, round(value_dict['orthographicWidth'], 2))
+		else:
+			camInfo = '%s (%s mm)' %(camera, round(value_dict['focalLength'], 2))
 
-	def setAttributes(self, obj, attrLs, value):
-		""" Set several attributes to the same value all at once.
+		if info['animated']:
+			self.cache[(camera, frame)] = camInfo
+		return camInfo
+
+
+	def report(self):
+		""" Return a dictionary reporting how many Maya commands the burn-in
+			has cost.
 		"""
-		for attr in attrLs:
-			try:
-				mc.setAttr('%s.%s' %(obj, attr), value)
-			except:
-				mc.warning("Could not set attribute: %s.%s" %(obj, attr))
+		frameCount = len(self.frames - set([None]))
+		frameCalls = self.calls - self.setupCalls
+		report = {}
+		report['setup_calls'] = self.setupCalls
+		report['frame_calls'] = frameCalls
+		report['frames'] = frameCount
+		report['calls_per_frame'] = float(frameCalls) / frameCount if frameCount else 0.0
+		return report
+
+# ----------------------------------------------------------------------------
+# End of burn-in data class
+# ============================================================================
+# Viewport state class
+# ----------------------------------------------------------------------------
 
+class ViewportState(object):
+	""" Transaction for the viewport and camera state a playblast changes.
+		Camera shape attributes, model editor flags, HUD visibility and the
+		look-through camera are captured when they're first overridden, and
+		values are only set if they differ from the current ones. On exit,
+		only the values which were actually changed are restored, even if
+		an exception was raised. Use as a context manager:
+
+			with ViewportState(panel) as state:
+				state.setAttrs(cameraShape, ['overscan'], 1.0)
+				...
+
+		Undo recording is suspended for the duration unless 'suspendUndo'
+		is False, in which case the changes are wrapped in an undo chunk.
+	"""
+	def __init__(self, panel=None, suspendUndo=True):
+		self.panel = panel
+		self.suspendUndo = suspendUndo
+		self.undoState = False
+		self.original = {}
+		self.current = {}
+		self.setter_dict = {}
+		self.key_ls = []  # Keys in the order they were first captured
+		self.cleanup_ls = []
+
+
+	def __enter__(self):
+		if self.suspendUndo:
+			self.undoState = mc.undoInfo(query=True, stateWithoutFlush=True)
+			if self.undoState:
+				mc.undoInfo(stateWithoutFlush=False)
+		else:
+			mc.undoInfo(openChunk=True, chunkName='u_preview')
+		return self
 
-	# ------------------------------------------------------------------------
-	# Burn-in / HUD
 
-	def displayHUD(self, query=False, setValue=True):
-		""" Show, hide or query the entire HUD.
+	def __exit__(self, excType, excValue, traceback):
+		try:
+			for func in reversed(self.cleanup_ls):
+				try:
+					func()
+				except Exception as e:
+					mc.warning("Viewport clean-up failed: %s" %e)
+			self.cleanup_ls = []
+			self.restore()
+		finally:
+			if self.suspendUndo:
+				if self.undoState:
+					mc.undoInfo(stateWithoutFlush=True)
+			else:
+				mc.undoInfo(closeChunk=True, chunkName='u_preview')
+		return False  # Don't suppress exceptions
+
+
+	def capture(self, key, value, setter):
+		""" Record the original value for the given key, along with a
+			function to set it, unless it has already been captured.
 		"""
-		# currentPanel = mc.getPanel(withFocus=True)
-		# panelType = mc.getPanel(typeOf=currentPanel)
-		# if panelType == "modelPanel":
-		# 	if query:
-		# 		return mc.modelEditor(currentPanel, query=True, hud=True)
-		# 	else:
-		# 		mc.modelEditor(currentPanel, edit=True, hud=setValue)
+		if key not in self.original:
+			self.original[key] = value
+			self.current[key] = value
+			self.setter_dict[key] = setter
+			self.key_ls.append(key)
 
-		if query:
-			return mc.modelEditor(self.activeView, query=True, hud=True)
+
+	def apply(self, key, value):
+		""" Set the value for a captured key, if it differs from the current
+			value.
+		"""
+		if self.current[key] == value:
+			return
+		try:
+			self.setter_dict[key](value)
+		except RuntimeError:
+			mc.warning("Could not set %s" %key[1])
 		else:
-			mc.modelEditor(self.activeView, edit=True, hud=setValue)
+			self.current[key] = value
 
 
-	def storeHUD(self):
-		""" Store the current state of the HUD in a dictionary.
+	def restore(self):
+		""" Restore the original value of everything that was changed, in
+			reverse order.
 		"""
-		hudLs = mc.headsUpDisplay(listHeadsUpDisplays=True)
+		for key in reversed(self.key_ls):
+			if self.current[key] != self.original[key]:
+				self.apply(key, self.original[key])
 
-		hudDic = {}
-		for hud in hudLs:
-			hudDic[hud] = mc.headsUpDisplay(hud, query=True, vis=True)
 
-		return hudDic
+	def addCleanup(self, func):
+		""" Register a function to be called on exit, before the original
+			state is restored.
+		"""
+		self.cleanup_ls.append(func)
 
 
-	def showHUD(self, vis):
-		""" Hide or show all HUD elements at once.
+	def captureAttrs(self, node, attr_ls):
+		""" Capture several of a node's attributes at once, so they can be
+			set later without querying them again.
 		"""
-		hudLs = mc.headsUpDisplay(listHeadsUpDisplays=True)
+		for attr in attr_ls:
+			plug = '%s.%s' %(node, attr)
+			try:
+				value = mc.getAttr(plug)
+			except (RuntimeError, ValueError):
+				mc.warning("Could not get attribute: %s" %plug)
+				continue
+			self.capture(('attr', plug), value, lambda value, plug=plug: mc.setAttr(plug, value))
 
-		for hud in hudLs:
-			mc.headsUpDisplay(hud, edit=True, vis=vis)
+
+	def setAttrs(self, node, attr_ls, value):
+		""" Set several attributes to the same value all at once.
+		"""
+		self.captureAttrs(node, [attr for attr in attr_ls if ('attr', '%s.%s' %(node, attr)) not in self.original])
+		for attr in attr_ls:
+			key = ('attr', '%s.%s' %(node, attr))
+			if key in self.original:
+				self.apply(key, value)
 
 
-	def restoreHUD(self, hudDic):
-		""" Restore the HUD from the state stored in the dictionary.
+	def setEditor(self, flag, value):
+		""" Set a model editor flag for the panel, e.g. 'hud' or 'sel'.
 		"""
-		hudLs = mc.headsUpDisplay(listHeadsUpDisplays=True)
+		key = ('editor', '%s -%s' %(self.panel, flag))
+		if key not in self.original:
+			kwargs = {flag: True}
+			self.capture(key, mc.modelEditor(self.panel, query=True, **kwargs), 
+			             lambda value: mc.modelEditor(self.panel, edit=True, **{flag: value}))
+		self.apply(key, value)
+
+
+	def setHUDs(self, vis):
+		""" Show or hide all HUD elements at once. The visibility of every
+			element is captured in a single pass.
+		"""
+		for hud in mc.headsUpDisplay(listHeadsUpDisplays=True) or []:
+			key = ('hud', hud)
+			if key not in self.original:
+				self.capture(key, mc.headsUpDisplay(hud, query=True, vis=True), 
+				             lambda value, hud=hud: mc.headsUpDisplay(hud, edit=True, vis=value))
+			self.apply(key, vis)
+
+
+	def lookThru(self, camera):
+		""" Look through the given camera in the panel.
+		"""
+		key = ('camera', self.panel)
+		if key not in self.original:
+			self.capture(key, mc.modelPanel(self.panel, query=True, camera=True), 
+			             lambda value: mc.lookThru(self.panel, value))
+		self.apply(key, camera)
+
+# ----------------------------------------------------------------------------
+# End of viewport state class
+# ============================================================================
+# Main class
+# ----------------------------------------------------------------------------
+
+class Preview():
 
-		for hud, vis in hudDic.iteritems():
-			mc.headsUpDisplay(hud, edit=True, vis=vis)
+	def __init__(self, outputDir, outputFile, outputFormat, activeView, camera, 
+				 res, frRange, offscreen, noSelect, guides, burnin, 
+				 interruptible, processes=1, headless=False, resume=False, 
+				 incremental=False, cameras=None, burninMode='hud', 
+				 suspendUndo=True, viewportProfile="Current settings", 
+				 frameStep=1, frameList=None, resizeOutputs=None, 
+				 captureBackend='playblast', memoryBudget=512, verify=True, 
+				 memoryLimit=0, background=False):
+		self.playblastDir = outputDir
+		self.outputFile = outputFile
+		self.formatName = outputFormat
+		if outputFormat == "QuickTime":
+			self.outputFormat = "qt"
+			self.compression = "H.264"
+			self.sound = self.getActiveAudioNode()
+		elif outputFormat == "MPEG-4 (ffmpeg)":
+			self.outputFormat = "ffmpeg"
+			self.compression = "jpg"  # Intermediate frames piped to encoder
+			self.sound = self.getActiveAudioNode()
+		elif outputFormat == "JPEG sequence":
+			self.outputFormat = "image"
+			self.compression = "jpg"
+			self.sound = ""
+		elif outputFormat == "TIFF sequence":
+			self.outputFormat = "image"
+			self.compression = "tif"
+			self.sound = ""
+		self.activeView = activeView
+		self.camera = camera
+		self.res = (int(res[0]), int(res[1]))
+		self.frRange = (int(frRange[0]), int(frRange[1]))
+		self.frameStep = max(1, int(frameStep))
+		self.frameList = None
+		if frameList:
+			self.frameList = sorted(set(int(frame) for frame in frameList))
+			self.frRange = (self.frameList[0], self.frameList[-1])
+		self.resizeOutputs = [(name, (int(size[0]), int(size[1]))) for name, size in resizeOutputs or []]
+		self.captureBackend = captureBackend
+		self.memoryBudget = memoryBudget
+		self.verify = verify
+		self.memoryLimit = memoryLimit
+		self.offscreen = offscreen
+		self.noSelect = noSelect
+		self.guides = guides
+		self.burnin = burnin
+		self.burninMode = burninMode
+		self.postBurnin = False
+		self.burninData = None
+		self.interruptible = interruptible
+		self.processes = int(processes)
+		self.headless = headless
+		self.resume = resume
+		self.incremental = incremental
+		self.fingerprint_dict = {}
+		self.cameras = cameras
+		self.suspendUndo = suspendUndo
+		self.viewportState = None
+		self.viewportProfile = viewportProfile
+		self.encoder = None  # Path to ffmpeg for MPEG-4 output
+		self.frameTimer = None
+		self.timingReport = None
+		self.captureFrames = None  # Frames still to capture in the current playblast command
+		self.background = background
+		self.progress = None  # Called with each frame number as it's captured
+		self.chunkProgress = None  # Called with (frames done, total) between chunks
+		self.chunkSize = CHUNK_SIZE
+		self.cancelled = False
+		self.stopMessage = ""  # Why the playblast was stopped early, e.g. out of memory
+		self.framesDone = 0
+		self.framesTotal = 0
+		self.stageTimer = timing.StageTimer()
+		self.warning_ls = []
+		self.frameSize_dict = {}  # Frame sizes for each verified directory
 
 
+	# ------------------------------------------------------------------------
+	# Burn-in / HUD
+
 	# Header
 	def hudHeader(self):
-		return "UNIT"
+		return self.burninData.get('header')
 
 	# Current project
 	def hudJob(self):
-		_job = os.environ['PREVIEW_JOB']
-		_shot = os.environ['PREVIEW_SHOT']
-		return '%s - %s' %(_job, _shot)
+		return self.burninData.get('job')
 
 	# Maya scene name
 	def hudScene(self):
-		return os.path.split(mc.file(q=True, exn=True))[1]
+		return self.burninData.get('scene')
 
-	# Camera and lens info
-	def hudCamera(self):
+	# Camera and lens info (optionally for a specific camera and frame)
+	def hudCamera(self, camera=None, frame=None):
 		#activeCamera = self.getActiveCamera(mc.getPanel(withFocus=True))
-		activeCamera = self.camera
-		cameraShape = [activeCamera]
-		if mc.nodeType(activeCamera) != 'camera':
-			cameraShape = mc.listRelatives(activeCamera, shapes=True)
-		if mc.getAttr(cameraShape[0] + '.orthographic'):
-			orthoWidth = mc.getAttr(cameraShape[0] + '.orthographicWidth')
-			orthoWidth = round(orthoWidth, 2)
-			camInfo = '%s (ortho %s)' %(activeCamera, orthoWidth)
-		else:
-			cameraLens = mc.getAttr(cameraShape[0] + '.focalLength')
-			cameraLens = round(cameraLens, 2)
-			camInfo = '%s (%s mm)' %(activeCamera, cameraLens)
-		return camInfo
+		return self.burninData.camera(camera or self.camera, frame)
 
 	# Date & time
 	def hudTime(self):
-		return time.strftime("%d/%m/%Y %H:%M")
+		return self.burninData.get('time')
 
 	# Artist
 	def hudArtist(self):
-		return os.environ['USERNAME']  #IC_USERNAME
+		return self.burninData.get('artist')
 
 	# Current frame
 	def hudFrame(self):
-		return mc.currentTime(q=True)
+		return self.burninData.frame()
 
 
 	def showBurnin(self):
 		""" Create custom elements and add them to the HUD.
 			Names of all custom HUDs must begin with 'custom_hud'.
 		"""
-		# Hide all current HUD elements
-		self.showHUD(0)
-
 		# Delete pre-existing custom HUD elements
 		self.hideBurnin()
 
@@ -250,6 +581,39 @@ class Preview():
 		                  dataFontSize='large')
 
 
+	def getBurninFields(self, frame, camera=None):
+		""" Return the burn-in for the given frame as a list of (section,
+			text, size) tuples, matching the layout of the HUD burn-in.
+		"""
+		return [(0, self.hudJob(), 'small'), 
+		        (3, self.hudArtist(), 'small'), 
+		        (4, self.hudTime(), 'small'), 
+		        (5, self.hudScene(), 'small'), 
+		        (5, self.hudCamera(camera, frame), 'small'), 
+		        (8, self.hudHeader(), 'small'), 
+		        (9, frame, 'large')]
+
+
+	def applyBurnin(self, frame_ls, outputDir=None, camera=None):
+		""" Composite the burn-in onto rendered frames as a post-process.
+			The text for each frame is gathered here, then the image
+			processing is done in a pool of worker threads.
+		"""
+		import burnin
+
+		if outputDir is None:
+			outputDir = self.playblastDir
+
+		item_ls = []
+		for frame in frame_ls:
+			path = sequence.framePath(outputDir, self.outputFile, self.compression, frame)
+			item_ls.append((path, self.getBurninFields(frame, camera)))
+
+		failed = burnin.Burnin().process(item_ls)
+		if failed:
+			self.warning("Could not apply burn-in to %d frames." %failed)
+
+
 	def hideBurnin(self):
 		""" Remove the custom HUD elements.
 		"""
@@ -264,6 +628,58 @@ class Preview():
 	# ------------------------------------------------------------------------
 
 
+	def warning(self, msg):
+		""" Issue a warning and record it for the playblast result.
+		"""
+		mc.warning(msg)
+		self.warning_ls.append(msg)
+
+
+	def createResult(self, status, output=None, message="", frame_ls=None, outputDir_ls=None):
+		""" Return a PlayblastResult with the frames written and their total
+			size, the time spent in each stage and the warnings issued.
+		"""
+		frame_ls = sorted(frame_ls or [])
+		size = 0
+		if output and frame_ls:
+			size = self.getOutputSize(output, frame_ls, outputDir_ls)
+
+		return PlayblastResult(status, 
+		                       path=output, 
+		                       message=message, 
+		                       frames=frame_ls, 
+		                       bytes=size, 
+		                       timings=self.stageTimer.report(), 
+		                       warnings=list(self.warning_ls), 
+		                       timingReport=self.timingReport)
+
+
+	def getOutputSize(self, output, frame_ls, outputDir_ls=None):
+		""" Return the total size in bytes of the given frames of the image
+			sequence in each output directory, or of the movie file(s). The
+			frame sizes found when verifying the output are used if available,
+			so the directory isn't listed again.
+		"""
+		if self.outputFormat != 'image':
+			size = 0
+			for path in output if isinstance(output, list) else [output]:
+				# Maya doesn't add the extension to QuickTime output paths
+				for moviePath in (path, '%s.mov' %path):
+					if os.path.isfile(moviePath):
+						size += os.path.getsize(moviePath)
+						break
+			return size
+
+		size = 0
+		for outputDir in outputDir_ls or [self.playblastDir]:
+			size_dict = self.frameSize_dict.get(outputDir)
+			if size_dict is None:
+				frame_dict = sequence.scanSequence(outputDir, self.outputFile, self.compression)
+				size_dict = dict((frame, item[1]) for frame, item in frame_dict.items())
+			size += sum(size_dict.get(frame, 0) for frame in frame_ls)
+		return size
+
+
 	def getActiveAudioNode(self):
 		""" Gets active audio node from Maya's time slider control.
 		"""
@@ -274,137 +690,1322 @@ class Preview():
 
 
 	def playblast_(self):
-		""" Sets playblast options and runs playblast.
+		""" Sets playblast options and runs playblast. Returns a
+			PlayblastResult.
 		"""
-		if not self.activeView:
-			msg = "No active view selected. Please select a camera panel to playblast and try again."
-			mc.warning(msg)
-			return False, msg
+		self.stageTimer.start('setup')
+		camera_ls = self.cameras or [self.camera]
+		multiCamera = len(camera_ls) > 1
 
-		# Get current active panel camera
-		try:
-			activeCameraOrig = mc.modelPanel(self.activeView, cam=True, q=True)
-		except:
-			msg = "Panel '%s' not found. Please select a camera panel to playblast and try again." %self.activeView
+		# Switching cameras needs a model panel to look through
+		if multiCamera and self.headless:
+			msg = "Capturing several cameras is not supported in headless playblasts. Playblast each camera separately."
 			mc.warning(msg)
-			return False, msg
+			return self.createResult("Failed", message=msg)
+
+		# Frame step is only supported for image sequences, as the skipped
+		# frames are filled in by holding the rendered ones
+		if self.frameStep > 1 and (self.outputFormat != 'image' or multiCamera or self.frameList):
+			self.warning("Frame step is only supported for frame ranges rendered to image sequences from a single camera. Rendering every frame.")
+			self.frameStep = 1
+
+		# Only the frames of a single image sequence are checked to see
+		# which need updating
+		if (self.resume or self.incremental) and multiCamera:
+			self.warning("Resume and incremental playblasts are only supported from a single camera. Rendering every frame.")
+			self.resume = False
+			self.incremental = False
+
+		# Movies need a continuous range of frames
+		if self.frameList and self.outputFormat != 'image':
+			self.warning("Frame lists are only supported for image sequences. Rendering frames %d-%d." %self.frRange)
+			self.frameList = None
+
+		# Reading the viewport into memory needs a panel to read from, and
+		# writes image files. Several cameras are always read from the
+		# viewport when possible (see runMultiCamera).
+		if self.captureBackend == 'memory' and (self.outputFormat != 'image' or self.headless or self.processes > 1) and not multiCamera:
+			self.warning("Capture to memory is only supported for image sequences in the current session. Using playblast.")
+			self.captureBackend = 'playblast'
+
+		# Extra resolutions are made by resizing the captured frames
+		if self.resizeOutputs and self.outputFormat != 'image':
+			self.warning("Extra output resolutions are only supported for image sequences.")
+			self.resizeOutputs = []
+
+		# Hand the whole playblast off to a worker process so the session
+		# stays interactive
+		if self.background and not self.headless:
+			if not multiCamera:
+				return self.playblastBackground()
+			self.warning("Background playblasts are only supported from a single camera. Playblasting in the current session.")
+
+		# Hand the playblast off to worker processes
+		if self.processes > 1 and not self.headless:
+			if self.outputFormat == 'image' and not multiCamera:
+				return self.playblastParallel()
+			self.warning("Parallel playblasts are only supported for image sequences from a single camera. Using a single process.")
+
+		# Burn-in can be composited onto image frames after capture instead
+		# of using the HUD. Headless playblasts have no HUD, so always use
+		# the post-process.
+		self.postBurnin = False
+		if self.burnin and (self.burninMode == 'post' or self.headless):
+			if self.outputFormat == 'qt':
+				self.warning("Post-process burn-in is not supported for QuickTime movies. Using the HUD.")
+			else:
+				self.postBurnin = True
+		if self.burnin:
+			self.burninData = BurninData()
+		self.frameTimer = timing.FrameTimer()
+		self.frameTimer.start()
+
+		# When resuming or re-blasting incrementally, only render the frames
+		# which need updating
+		if multiCamera:
+			frame_ls = self.getFrames()
+		else:
+			frame_ls = self.getFramesToRender()
+			if not frame_ls:
+				print("All frames are up to date. Nothing to playblast.")
+				if self.frameStep > 1:
+					self.holdFrames()
+				return self.createResult("Completed", sequence.sequencePath(self.playblastDir, self.outputFile, self.compression))
+		self.framesDone = 0
+		self.framesTotal = len(frame_ls)
+
+		# There are no panels to look through when running headless
+		if not self.headless:
+			if not self.activeView:
+				msg = "No active view selected. Please select a camera panel to playblast and try again."
+				mc.warning(msg)
+				return self.createResult("Failed", message=msg)
+
+			# Check the panel has a camera
+			try:
+				mc.modelPanel(self.activeView, cam=True, q=True)
+			except:
+				msg = "Panel '%s' not found. Please select a camera panel to playblast and try again." %self.activeView
+				mc.warning(msg)
+				return self.createResult("Failed", message=msg)
 
-		# Get active camera and shape
-		activeCamera = self.camera
+		# Get active camera(s) and shapes
+		activeCamera = camera_ls[0]
 		if not activeCamera:
 			msg = "Unable to generate playblast as no camera was specified."
 			mc.warning(msg)
-			return False, msg
-		cameraShape = [activeCamera]
-		if mc.nodeType(activeCamera) != 'camera':
-			cameraShape = mc.listRelatives(activeCamera, shapes=True)
-
-		# Disable undo
-		mc.undoInfo(openChunk=True, chunkName='u_preview')
-		# undoState = mc.undoInfo(q=True, state=True)
-		# if undoState:
-		# 	mc.undoInfo(state=False)
-
-		# Look through camera if no active panel
-		mc.lookThru(self.activeView, activeCamera)
-
-		# Store current options
-		displayOptions = self.storeAttributes(cameraShape[0], ['displayResolution', 'displayFieldChart', 'displaySafeAction', 'displaySafeTitle', 'displayFilmPivot', 'displayFilmOrigin', 'overscan', 'panZoomEnabled'])
-		displayHUD = self.displayHUD(query=True)
-		hudState = self.storeHUD()
-
-		# Disable selection highlighting
-		if self.noSelect:
-			selectionHighlighting = mc.modelEditor(self.activeView, q=1, sel=1)
-			mc.modelEditor(self.activeView, e=1, sel=False)
-
-		# Display custom burn-in
+			return self.createResult("Failed", message=msg)
+		cameraShape_ls = []
+		for camera in camera_ls:
+			cameraShape = [camera]
+			if mc.nodeType(camera) != 'camera':
+				cameraShape = mc.listRelatives(camera, shapes=True)
+			cameraShape_ls.append(cameraShape[0])
+
+		# Find the encoder before touching the viewport
+		if self.outputFormat == 'ffmpeg':
+			import encoder
+			self.encoder = encoder.findEncoder()
+			if not self.encoder:
+				msg = "Could not find ffmpeg. Please add it to your PATH or set PREVIEW_FFMPEG."
+				mc.warning(msg)
+				return self.createResult("Failed", message=msg)
+
+		# Override the viewport and camera display settings. The original
+		# state is restored on exit, even if the playblast fails.
+		self.viewportState = ViewportState(None if self.headless else self.activeView, suspendUndo=self.suspendUndo)
+		with self.viewportState as state:
+			for cameraShape in cameraShape_ls:
+				state.captureAttrs(cameraShape, CAMERA_DISPLAY_ATTRS)
+
+			if not self.headless:
+				# Look through camera if no active panel
+				state.lookThru(activeCamera)
+
+				# Disable selection highlighting
+				if self.noSelect:
+					state.setEditor('sel', False)
+
+				# Display custom burn-in
+				if self.burnin and not self.postBurnin:
+					state.setEditor('hud', True)
+					state.setHUDs(False)
+					state.addCleanup(self.hideBurnin)
+					self.showBurnin()
+				else:
+					state.setEditor('hud', False)
+
+			# Apply viewport profile
+			self.applyViewportProfile(state)
+
+			# Time each frame as it's captured
+			self.addFrameTimerCallback(state)
+
+			for cameraShape in cameraShape_ls:
+				# Display guides
+				if self.guides:
+					state.setAttrs(cameraShape, ['displayResolution', 'displaySafeAction', 'displaySafeTitle'], True)
+				else:
+					state.setAttrs(cameraShape, ['displayResolution', 'displayFieldChart', 'displaySafeAction', 'displaySafeTitle', 'displayFilmPivot', 'displayFilmOrigin'], False)
+
+				# Set overscan value to 1.0 & disable 2D pan/zoom (unless
+				# render pan/zoom is enabled)
+				state.setAttrs(cameraShape, ['overscan'], 1.0)
+				if mc.getAttr(cameraShape+'.panZoomEnabled') and mc.getAttr(cameraShape+'.renderPanZoom'):
+					pass
+				else:
+					state.setAttrs(cameraShape, ['panZoomEnabled'], False)
+
+			# Actually generate playblast!
+			self.stageTimer.start('capture')
+			self.reportChunk(0)  # Start the progress display before the first chunk
+			completed_ls = []
+			if multiCamera:
+				output, completed_ls = self.runMultiCamera(camera_ls)
+				self.camera = activeCamera
+			elif self.outputFormat == 'ffmpeg':
+				output, completed_ls = self.runStreamEncoder(self.chunkSize)
+			else:
+				output, completed_ls = self.runFrames(frame_ls)
+				self.stageTimer.start('post')
+				if self.postBurnin:
+					self.applyBurnin(completed_ls)
+				if self.resizeOutputs:
+					self.resizeFrames(completed_ls)
+				if self.frameStep > 1:
+					self.holdFrames()
+				if self.incremental:
+					self.storeFingerprints(completed_ls)
+			self.stageTimer.start('restore')
+
+		# Report the cost of the burn-in
+		self.stageTimer.start('post')
 		if self.burnin:
-			self.displayHUD(setValue=True)
-			self.showBurnin()
-		else:
-			self.displayHUD(setValue=False)
+			report = self.burninData.report()
+			print("Burn-in cost %.2f Maya commands per frame over %d frames (%d setup commands)." %(report['calls_per_frame'], report['frames'], report['setup_calls']))
 
-		# Display guides
-		if self.guides:
-			self.setAttributes(cameraShape[0], ['displayResolution', 'displaySafeAction', 'displaySafeTitle'], True)
-		else:
-			self.setAttributes(cameraShape[0], ['displayResolution', 'displayFieldChart', 'displaySafeAction', 'displaySafeTitle', 'displayFilmPivot', 'displayFilmOrigin'], False)
+		# Report capture timings
+		self.writeTimingReport()
 
-		# Set overscan value to 1.0 & disable 2D pan/zoom (unless render
-		# pan/zoom is enabled)
-		self.setAttributes(cameraShape[0], ['overscan'], 1.0)
-		if mc.getAttr(cameraShape[0]+'.panZoomEnabled') and mc.getAttr(cameraShape[0]+'.renderPanZoom'):
-			pass
+		# Check the image sequence(s) for dropped or damaged frames
+		if multiCamera:
+			outputDir_ls = [self.getCameraOutputDir(camera) for camera in camera_ls]
 		else:
-			self.setAttributes(cameraShape[0], ['panZoomEnabled'], False)
-
-		# Actually generate playblast!
-		output = self.run_playblast()
-
-		# Now reset things to their state prior to playblasting...
-		# Hide custom burn-in
-		if self.burnin:
-			self.hideBurnin()
-
-		# Restore selection highlighting
-		if self.noSelect:
-			mc.modelEditor(self.activeView, e=1, sel=selectionHighlighting)
-
-		# Restore original settings
-		self.retrieveAttributes(cameraShape[0], displayOptions)
-		self.restoreHUD(hudState)
-		self.displayHUD(setValue=displayHUD)
-
-		# Restore camera panel
-		mc.lookThru(self.activeView, activeCameraOrig)
-
-		# Re-enable undo
-		mc.undoInfo(closeChunk=True, chunkName='u_preview')
-		# if undoState:
-		# 	mc.undoInfo(state=True)
+			outputDir_ls = [self.playblastDir]
+		if output and self.outputFormat == 'image' and self.verify:
+			if not all([self.verifyOutput(outputDir) for outputDir in outputDir_ls]):
+				if not self.interruptible:
+					return self.createResult("Failed", message="Playblast output failed verification. Some frames are missing or damaged.")
+				output = None
 
 		# Return file output
 		# print(output)
 		if output:
-			return "Completed", output
+			return self.createResult("Completed", output, frame_ls=completed_ls, outputDir_ls=outputDir_ls)
 		# Return the output file path even if the playblast was interrupted.
 		# In the playblast command's return value, Maya automatically adds the
 		# extension for jpg, but not mov. We are replicating that behaviour
 		# here.
 		else:
-			if self.interruptible:
-				if self.outputFormat == 'image':
+			if self.cancelled:
+				print("Playblast cancelled after %d of %d frames." %(len(completed_ls), len(frame_ls)))
+			if self.interruptible or self.cancelled or self.stopMessage:
+				if multiCamera:
+					output = [self.getCameraOutput(camera) for camera in camera_ls]
+				elif self.outputFormat == 'image':
 					output = os.path.join(self.playblastDir, '%s.#.%s' %(self.outputFile, self.compression))
 				elif self.outputFormat == 'qt':
 					output = os.path.join(self.playblastDir, self.outputFile)
-				return "Interrupted", output
+				elif self.outputFormat == 'ffmpeg':
+					output = os.path.join(self.playblastDir, '%s.mp4' %self.outputFile)
+				return self.createResult("Interrupted", output, message=self.stopMessage, frame_ls=completed_ls, outputDir_ls=outputDir_ls)
 			else:  # Fail on interrupt
-				return "Failed", "Playblast was interrupted."
+				return self.createResult("Failed", message="Playblast was interrupted.")
+
+
+	# ------------------------------------------------------------------------
+	# Progress and cancellation
+
+	def cancel(self):
+		""" Stop the playblast at the end of the current chunk of frames.
+			The frames already captured are kept, and the playblast is
+			reported as interrupted.
+		"""
+		self.cancelled = True
+
+
+	def reportChunk(self, frames):
+		""" Count a chunk of captured frames and report the progress. This
+			is the point where the UI gets to update and handle the cancel
+			button, so it's only called between playblast commands.
+		"""
+		self.framesDone += frames
+		if self.chunkProgress:
+			self.chunkProgress(self.framesDone, self.framesTotal)
+
+
+	def runChunked(self, frame_ls):
+		""" Capture a list of frames in chunks of at most 'chunkSize'
+			frames, reporting progress after each chunk and stopping before
+			the next one if the playblast has been cancelled. Returns a tuple
+			containing the output of the last playblast command (None if it
+			was interrupted or cancelled) and the list of frames which were
+			rendered.
+		"""
+		# Split contiguous runs into sub-ranges, and isolated frames into
+		# lists, as (contiguous, frames) tuples
+		range_ls, isolated_ls = sequence.batchFrames(frame_ls)
+		chunk_ls = []
+		for frRange in range_ls:
+			for start in range(frRange[0], frRange[1]+1, self.chunkSize):
+				chunk_ls.append((True, list(range(start, min(start+self.chunkSize, frRange[1]+1)))))
+		for i in range(0, len(isolated_ls), self.chunkSize):
+			chunk_ls.append((False, isolated_ls[i:i+self.chunkSize]))
+
+		output = None
+		completed_ls = []
+		for contiguous, chunk in chunk_ls:
+			if self.cancelled:
+				return None, sorted(completed_ls)
+			if contiguous:
+				output = self.run_playblast((chunk[0], chunk[-1]))
+			else:
+				output = self.run_playblast(frames=chunk)
+			if not output:  # Interrupted
+				return None, sorted(completed_ls)
+			completed_ls += chunk
+			self.reportChunk(len(chunk))
+
+		return output, sorted(completed_ls)
+
+	# End progress and cancellation
+	# ------------------------------------------------------------------------
+
+
+	def runFrames(self, frame_ls):
+		""" Capture a list of frames using as few playblast commands as
+			possible. Each contiguous run of frames is rendered as a range,
+			and the isolated frames are rendered together in a single
+			command. Returns a tuple containing the output of the last
+			playblast command (None if it was interrupted) and the list of
+			frames which were rendered.
+		"""
+		if self.captureBackend == 'memory':
+			return self.runMemoryCapture(frame_ls)
+
+		# Capture in chunks when progress is reported, so the UI can update
+		# and the playblast can be cancelled between them
+		if self.chunkProgress and not self.memoryLimit and self.outputFormat == 'image':
+			return self.runChunked(frame_ls)
+
+		range_ls, isolated_ls = sequence.batchFrames(frame_ls)
+
+		# Image sequences can be captured in segments to stay within the
+		# memory limit
+		if self.memoryLimit and self.outputFormat == 'image':
+			output = None
+			completed_ls = []
+			for frRange in range_ls:
+				output, segment_ls = self.runSegmented(list(range(frRange[0], frRange[1]+1)))
+				completed_ls += segment_ls
+				if not output:  # Interrupted
+					return None, completed_ls
+			if isolated_ls:
+				output, segment_ls = self.runSegmented(isolated_ls, contiguous=False)
+				completed_ls += segment_ls
+			return output, sorted(completed_ls)
+
+		output = None
+		completed_ls = []
+		for frRange in range_ls:
+			output = self.run_playblast(frRange)
+			if not output:  # Interrupted
+				return None, completed_ls
+			completed_ls += range(frRange[0], frRange[1]+1)
+
+		if isolated_ls:
+			output = self.run_playblast(frames=isolated_ls)
+			if not output:  # Interrupted
+				return None, completed_ls
+			completed_ls += isolated_ls
+
+		return output, sorted(completed_ls)
+
+
+	# ------------------------------------------------------------------------
+	# Memory-limited playblasts
+
+	def getMemoryUsage(self):
+		""" Return the memory used by Maya in MB. The resident set size is
+			used if psutil is available, otherwise Maya's heap memory.
+		"""
+		if psutil is not None:
+			return psutil.Process(os.getpid()).memory_info().rss / (1024.0*1024.0)
+		return mc.memory(heapMemory=True, megaByte=True)
 
 
-	def run_playblast(self):
+	def flushCaches(self):
+		""" Free as much memory as possible between segments, without
+			touching the undo queue or the scene.
+		"""
+		import gc
+
+		mc.clearCache(all=True)
+		try:
+			mc.cacheEvaluator(flushCache='destroy')  # Cached playback
+		except (AttributeError, RuntimeError, TypeError):
+			pass
+		try:
+			mc.ogs(reset=True)  # Release Viewport 2.0 resources
+		except RuntimeError:
+			pass
+		gc.collect()
+
+
+	def runSegmented(self, frame_ls, contiguous=True):
+		""" Capture a list of frames in segments, measuring Maya's memory use
+			after each one. The size of the next segment is chosen so the
+			memory growth seen so far stays within the memory limit, and
+			caches are flushed when the limit is approached. Flushing stops
+			once it no longer frees memory, and segments are never smaller
+			than MIN_SEGMENT_SIZE. If even a minimum segment would exceed
+			the limit, the playblast is stopped with a warning and
+			'stopMessage' set. 'contiguous' frames are captured as ranges,
+			otherwise as lists of frames. Returns a tuple containing the
+			output of the last playblast command (None if it was interrupted
+			or stopped) and the list of frames which were rendered.
+		"""
+		output = None
+		completed_ls = []
+		size = SEGMENT_SIZE
+		threshold = self.memoryLimit * FLUSH_THRESHOLD
+		flush = True
+		i = 0
+		while i < len(frame_ls):
+			if self.cancelled:
+				return None, completed_ls
+			segment_ls = frame_ls[i:i+size]
+			usageBefore = self.getMemoryUsage()
+			if contiguous:
+				output = self.run_playblast((segment_ls[0], segment_ls[-1]))
+			else:
+				output = self.run_playblast(frames=segment_ls)
+			if not output:  # Interrupted
+				return None, completed_ls
+			completed_ls += segment_ls
+			i += len(segment_ls)
+			self.reportChunk(len(segment_ls))
+
+			# Flush caches when approaching the limit, then size the next
+			# segment to fit in the remaining headroom
+			usage = self.getMemoryUsage()
+			growth = max(usage - usageBefore, 0.0) / len(segment_ls)
+			if flush and usage + growth > threshold:
+				usageBefore = usage
+				self.flushCaches()
+				usage = self.getMemoryUsage()
+				print("Flushed caches after frame %d. Memory usage %d MB of %d MB." %(segment_ls[-1], usage, self.memoryLimit))
+				if usageBefore - usage < self.memoryLimit * MIN_FLUSH_GAIN:
+					self.warning("Flushing caches is no longer freeing memory. Continuing with minimum size segments.")
+					flush = False
+
+			# Stop if the limit can't be kept
+			if i < len(frame_ls) and usage + growth * MIN_SEGMENT_SIZE > self.memoryLimit:
+				self.stopMessage = "Stopped after frame %d as memory usage (%d MB) can't be kept within the %d MB limit." %(segment_ls[-1], usage, self.memoryLimit)
+				self.warning(self.stopMessage)
+				return None, completed_ls
+
+			headroom = threshold - usage
+			if growth:
+				size = int(max(MIN_SEGMENT_SIZE, min(MAX_SEGMENT_SIZE, headroom / growth)))
+			else:
+				size = min(MAX_SEGMENT_SIZE, size*2)
+
+		return output, completed_ls
+
+	# End memory-limited playblasts
+	# ------------------------------------------------------------------------
+
+
+	def getGateRegion(self, view):
+		""" Return the part of the viewport inside the camera's resolution
+			gate as a tuple (x, y, width, height) in pixels from the top
+			left, i.e. the area a playblast would capture. Returns None if
+			the gate doesn't lie within the viewport, or if the camera's 2D
+			pan/zoom is in use.
+		"""
+		width, height = view.portWidth(), view.portHeight()
+		camera = om.MFnCamera(view.getCamera())
+		if camera.panZoomEnabled:
+			return None
+
+		# The frustums are measured on the same plane, so the gate's
+		# position in the viewport is the ratio between them
+		left, right, bottom, top = camera.getViewingFrustum(float(width)/height, True, False, False)
+		gateLeft, gateRight, gateBottom, gateTop = camera.getRenderingFrustum(float(self.res[0])/self.res[1])
+		x = int(round((gateLeft - left) / (right - left) * width))
+		y = int(round((top - gateTop) / (top - bottom) * height))
+		w = int(round((gateRight - gateLeft) / (right - left) * width))
+		h = int(round((gateTop - gateBottom) / (top - bottom) * height))
+
+		if w <= 0 or h <= 0 or x < 0 or y < 0 or x+w > width or y+h > height:
+			return None
+		return x, y, w, h
+
+
+	def readViewport(self, view, region=None):
+		""" Read the viewport's colour buffer into a NumPy array of RGBA
+			pixels with shape (height, width, 4), top row first. If 'region'
+			(x, y, width, height) is given, only that part is returned.
+		"""
+		import ctypes
+		import numpy
+
+		image = om.MImage()
+		view.readColorBuffer(image, True)
+		width, height = image.getSize()
+		data = ctypes.string_at(image.pixels(), width*height*4)
+		pixels = numpy.frombuffer(data, numpy.uint8).reshape(height, width, 4)
+		pixels = pixels[::-1]  # The buffer is stored bottom row first
+		if region:
+			x, y, w, h = region
+			pixels = pixels[y:y+h, x:x+w]
+		return pixels
+
+
+	def runMemoryCapture(self, frame_ls):
+		""" Capture a list of frames by drawing each one in the viewport and
+			reading it straight into memory. The frames are compressed and
+			written to disk by a pool of threads while the next frame is
+			evaluated, within the memory budget (in MB). Only the area
+			inside the camera's resolution gate is kept, as in a playblast,
+			and it's scaled to the output resolution if the viewport is a
+			different size. Returns a tuple containing the output path (None if any frames
+			failed) and the list of frames which were written.
+		"""
+		import maya.api.OpenMayaUI as omui
+		import framewriter
+
+		try:
+			import numpy
+		except ImportError:
+			self.warning("Capture to memory requires NumPy. Using playblast.")
+			self.captureBackend = 'playblast'
+			return self.runFrames(frame_ls)
+
+		if not os.path.isdir(self.playblastDir):
+			os.makedirs(self.playblastDir)
+
+		view = omui.M3dView.getM3dViewFromModelPanel(self.activeView)
+		region = self.getGateRegion(view)
+		if not region:
+			self.warning("The camera's resolution gate doesn't fit in the viewport, so it can't be captured to memory. Using playblast.")
+			self.captureBackend = 'playblast'
+			return self.runFrames(frame_ls)
+		if region[2] < self.res[0] or region[3] < self.res[1]:
+			self.warning("The resolution gate is %dx%d pixels in the viewport, so frames will be scaled up to %dx%d." %(region[2], region[3], self.res[0], self.res[1]))
+
+		writer = framewriter.FrameWriter(budget=self.memoryBudget)
+		completed_ls = []
+		try:
+			for frame in frame_ls:
+				if self.cancelled:
+					break
+				if self.frameTimer:
+					self.frameTimer.mark(frame)
+				mc.currentTime(frame, update=True)
+				view.refresh(False, True)  # Force a redraw of this view only
+				path = sequence.framePath(self.playblastDir, self.outputFile, self.compression, frame)
+				writer.add(path, self.readViewport(view, region), self.res)
+				completed_ls.append(frame)
+				if len(completed_ls) % self.chunkSize == 0:
+					self.reportChunk(self.chunkSize)
+		finally:
+			failed_ls = writer.close()
+			if self.frameTimer:
+				self.frameTimer.flush()
+		self.reportChunk(len(completed_ls) % self.chunkSize)  # The last partial chunk
+
+		print("Peak memory used by queued frames: %.1f MB" %(writer.peak / (1024.0*1024.0)))
+		if failed_ls:
+			self.warning("Could not write %d frames." %len(failed_ls))
+			completed_ls = [frame for frame in completed_ls if sequence.framePath(self.playblastDir, self.outputFile, self.compression, frame) not in failed_ls]
+			return None, completed_ls
+		if self.cancelled:
+			return None, completed_ls
+
+		return sequence.sequencePath(self.playblastDir, self.outputFile, self.compression), completed_ls
+
+
+	def applyViewportProfile(self, state):
+		""" Override the viewport settings specified by the selected viewport
+			profile. The overrides are made through the viewport state so
+			they are restored after the playblast. Model editor flags are
+			skipped when running headless.
+		"""
+		try:
+			profile = VIEWPORT_PROFILES[self.viewportProfile]
+		except KeyError:
+			self.warning("Viewport profile '%s' not found. Using current settings." %self.viewportProfile)
+			return
+
+		for attr, value in profile.get('globals', {}).items():
+			state.setAttrs('hardwareRenderingGlobals', [attr], value)
+
+		if not self.headless:
+			for flag, value in profile.get('editor', {}).items():
+				try:
+					state.setEditor(flag, value)
+				except (RuntimeError, TypeError):
+					self.warning("Could not set viewport option: %s" %flag)
+
+
+	# ------------------------------------------------------------------------
+	# Capture timing
+
+	def addFrameTimerCallback(self, state):
+		""" Mark the start of each frame in the frame timer when the current
+			time changes during the playblast. Only the frames being captured
+			by the current playblast command are marked, each one once, so
+			time changes between captures and Maya restoring the current time
+			when a playblast command finishes aren't counted. The callback is
+			removed when the viewport state is restored.
+		"""
+		def timeChanged(mtime, *args):
+			frame = int(round(mtime.asUnits(om.MTime.uiUnit())))
+			if self.captureFrames is None or frame not in self.captureFrames:
+				return
+			self.captureFrames.discard(frame)
+			self.frameTimer.mark(frame)
+			if self.progress:
+				self.progress(frame)
+
+		callbackId = om.MDGMessage.addTimeChangeCallback(timeChanged)
+		state.addCleanup(lambda: om.MMessage.removeCallback(callbackId))
+
+
+	def getTimingFile(self):
+		""" Return the path to the JSON file the timing report is written to.
+		"""
+		return os.path.join(self.playblastDir, '%s.timing.json' %self.outputFile)
+
+
+	def writeTimingReport(self):
+		""" Stop the frame timer, print a summary and write the full report
+			next to the output.
+		"""
+		self.frameTimer.finish()
+		report = self.frameTimer.report()
+		if report['frames']:
+			slowest = ", ".join("%d (%.2fs)" %(frame, seconds) for frame, seconds in report['slowest_frames'][:3])
+			print("Captured %d frames in %.1fs: mean %.1f fps, 5th percentile %.1f fps. Slowest frames: %s" %(report['frames'], report['total_time'], report['mean_fps'], report['fps_percentiles']['p5'], slowest))
+			if os.path.isdir(self.playblastDir):
+				self.frameTimer.write(self.getTimingFile(), report)
+		self.timingReport = report
+		return report
+
+	# End capture timing
+	# ------------------------------------------------------------------------
+
+
+	# ------------------------------------------------------------------------
+	# Multi-camera playblasts
+
+	def getCameraOutputDir(self, camera):
+		""" Return the output directory for the given camera when capturing
+			several cameras at once.
+		"""
+		return os.path.join(self.playblastDir, camera.split('|')[-1].replace(':', '_'))
+
+
+	def getCameraOutput(self, camera):
+		""" Return the output path for the given camera when capturing
+			several cameras at once.
+		"""
+		outputDir = self.getCameraOutputDir(camera)
+		if self.outputFormat == 'image':
+			return sequence.sequencePath(outputDir, self.outputFile, self.compression)
+		else:
+			return os.path.join(outputDir, self.outputFile)
+
+
+	def getCameraRegions(self, camera_ls):
+		""" Return a tuple containing the M3dView of the active panel and a
+			dictionary of the part of the viewport to read for each camera,
+			from getGateRegion(). Returns None, with a warning, if the
+			viewport can't be read for every camera.
+		"""
+		import maya.api.OpenMayaUI as omui
+
+		try:
+			import numpy
+		except ImportError:
+			self.warning("Capturing several cameras from the viewport requires NumPy. Playblasting each frame separately, which is much slower.")
+			return None
+
+		view = omui.M3dView.getM3dViewFromModelPanel(self.activeView)
+		region_dict = {}
+		for camera in camera_ls:
+			self.viewportState.lookThru(camera)
+			region = region_dict[camera] = self.getGateRegion(view)
+			if not region:
+				self.warning("The resolution gate of camera '%s' doesn't fit in the viewport, so it can't be read from the viewport. Playblasting each frame separately, which is much slower." %camera)
+				return None
+			if region[2] < self.res[0] or region[3] < self.res[1]:
+				self.warning("The resolution gate of camera '%s' is %dx%d pixels in the viewport, so frames will be scaled up to %dx%d." %(camera, region[2], region[3], self.res[0], self.res[1]))
+		return view, region_dict
+
+
+	def runMultiCamera(self, camera_ls):
+		""" Capture all the cameras while stepping through the timeline only
+			once. Each frame is evaluated once and then drawn from each camera
+			in turn, with each camera's frames written to a subdirectory of
+			the output directory. Image sequences are read straight from the
+			viewport as in runMemoryCapture(), as a playblast command for
+			every frame from every camera would cost more than the
+			evaluation saved. Returns a tuple containing a list of the
+			output paths (None if the playblast was interrupted or cancelled)
+			and the list of frames captured from every camera.
+		"""
+		# Movies can't be written a frame at a time, so capture each camera
+		# in turn
+		if self.outputFormat != 'image':
+			for camera in camera_ls:
+				if self.cancelled:
+					return None, []
+				self.camera = camera  # Update burn-in
+				self.viewportState.lookThru(camera)
+				if not self.run_playblast(outputDir=self.getCameraOutputDir(camera)):
+					return None, []
+			return [self.getCameraOutput(camera) for camera in camera_ls], self.getFrames()
+
+		writer = None
+		capture = self.getCameraRegions(camera_ls)
+		if capture:
+			import framewriter
+			view, region_dict = capture
+			writer = framewriter.FrameWriter(budget=self.memoryBudget)
+			for camera in camera_ls:
+				if not os.path.isdir(self.getCameraOutputDir(camera)):
+					os.makedirs(self.getCameraOutputDir(camera))
+
+		output = True
+		completed_ls = []
+		try:
+			for frame in self.getFrames():
+				if self.cancelled:
+					output = None
+					break
+				mc.currentTime(frame, update=True)
+				for camera in camera_ls:
+					self.camera = camera  # Update burn-in
+					self.viewportState.lookThru(camera)
+					if self.frameTimer:  # The time is already set, so mark it here
+						self.frameTimer.mark(frame)
+					if writer:
+						view.refresh(False, True)  # Force a redraw of this view only
+						path = sequence.framePath(self.getCameraOutputDir(camera), self.outputFile, self.compression, frame)
+						writer.add(path, self.readViewport(view, region_dict[camera]), self.res)
+						if self.frameTimer:
+							self.frameTimer.flush()
+					elif not self.run_playblast(outputDir=self.getCameraOutputDir(camera), frames=[frame]):
+						output = None
+						break
+				if not output:  # Interrupted
+					break
+				completed_ls.append(frame)
+				if len(completed_ls) % self.chunkSize == 0:
+					self.reportChunk(self.chunkSize)
+		finally:
+			failed_ls = writer.close() if writer else []
+		self.reportChunk(len(completed_ls) % self.chunkSize)  # The last partial chunk
+		if failed_ls:
+			self.warning("Could not write %d frames." %len(failed_ls))
+			completed_ls = [frame for frame in completed_ls if not any([sequence.framePath(self.getCameraOutputDir(camera), self.outputFile, self.compression, frame) in failed_ls for camera in camera_ls])]
+			output = None
+
+		for camera in camera_ls:
+			if self.postBurnin:
+				self.applyBurnin(completed_ls, self.getCameraOutputDir(camera), camera)
+			if self.resizeOutputs:
+				self.resizeFrames(completed_ls, self.getCameraOutputDir(camera))
+
+		if not output:
+			return None, completed_ls
+		return [self.getCameraOutput(camera) for camera in camera_ls], completed_ls
+
+	# End multi-camera playblasts
+	# ------------------------------------------------------------------------
+
+
+	# ------------------------------------------------------------------------
+	# Streaming encoder
+
+	def getFrameRate(self):
+		""" Return the scene's frame rate in frames per second.
+		"""
+		unit = mc.currentUnit(query=True, time=True)
+		try:
+			return FRAME_RATES[unit]
+		except KeyError:  # e.g. '23.976fps'
+			return float(unit.replace('fps', ''))
+
+
+	def runStreamEncoder(self, chunkSize=10):
+		""" Capture the frame range in small chunks and pipe each chunk's
+			frames to an ffmpeg subprocess while the next chunk is captured.
+			The intermediate frames are written to a local temp directory and
+			deleted as soon as they've been encoded. Audio from the time
+			slider is muxed in the same pass. Returns a tuple containing the
+			path to the movie (None if the playblast was interrupted,
+			cancelled or failed) and the list of frames encoded.
+		"""
+		import encoder
+
+		executable = self.encoder or encoder.findEncoder()
+
+		if not os.path.isdir(self.playblastDir):
+			os.makedirs(self.playblastDir)
+		output = os.path.join(self.playblastDir, '%s.mp4' %self.outputFile)
+		tmpDir = tempfile.mkdtemp(prefix='preview_')
+
+		# Get audio file and its offset relative to the start of the movie
+		fps = self.getFrameRate()
+		audio = None
+		audioOffset = 0.0
+		if self.sound:
+			audio = mc.getAttr(self.sound+'.filename')
+			audioOffset = (mc.getAttr(self.sound+'.offset') - self.frRange[0]) / float(fps)
+
+		stream = encoder.StreamEncoder(output, fps, audio, audioOffset, executable=executable)
+		length = self.frRange[1] - self.frRange[0] + 1
+		completed = True
+		completed_ls = []
+		for frRange in sequence.chunkRange(self.frRange, -(-length // chunkSize)):
+			if self.cancelled or not self.run_playblast(frRange, outputDir=tmpDir):  # Interrupted
+				completed = False
+				break
+			if self.postBurnin:
+				self.applyBurnin(range(frRange[0], frRange[1]+1), tmpDir)
+			for frame in range(frRange[0], frRange[1]+1):
+				stream.add(sequence.framePath(tmpDir, self.outputFile, self.compression, frame), remove=True)
+			completed_ls += range(frRange[0], frRange[1]+1)
+			self.reportChunk(frRange[1] - frRange[0] + 1)
+		success = stream.close()
+		shutil.rmtree(tmpDir, ignore_errors=True)
+
+		if completed and success:
+			return output, completed_ls
+		if success:
+			return None, completed_ls
+		return None, []
+
+	# End streaming encoder
+	# ------------------------------------------------------------------------
+
+
+	def getFrames(self):
+		""" Return the list of frames to playblast: the frame list if one
+			was given, otherwise every frame in the frame range.
+		"""
+		if self.frameList:
+			return list(self.frameList)
+		return list(range(self.frRange[0], self.frRange[1]+1))
+
+
+	def getMissingFrames(self):
+		""" Scan the output directory and return a list of the frames in the
+			frame range which are missing or were not written completely,
+			e.g. because a previous playblast was interrupted or crashed.
+		"""
+		frame_dict = sequence.scanSequence(self.playblastDir, self.outputFile, self.compression)
+
+		missing_ls = []
+		for frame in self.getFrames():
+			try:
+				path, size, mtime = frame_dict[frame]
+				if not sequence.isComplete(path, self.compression, size):
+					missing_ls.append(frame)
+			except KeyError:
+				missing_ls.append(frame)
+
+		return missing_ls
+
+
+	def getFramesToRender(self):
+		""" Return the list of frames which need to be rendered, taking the
+			resume, incremental and frame step options into account.
+		"""
+		frame_ls = self.getFrames()
+		if self.outputFormat == 'image':
+			if self.incremental:
+				frame_ls = self.getDirtyFrames()
+			elif self.resume:
+				frame_ls = self.getMissingFrames()
+
+		if self.frameStep > 1:
+			frame_ls = sequence.stepFrames(frame_ls, self.frRange[0], self.frameStep)
+
+		return frame_ls
+
+
+	def holdFrames(self, outputDir=None):
+		""" Fill in the frames skipped by the frame step with hard links to
+			(or copies of) the last rendered frame before each one, so the
+			sequence still plays back in real time. The frames of any extra
+			output resolutions are held too.
+		"""
+		if outputDir is None:
+			outputDir = self.playblastDir
+		dir_ls = [outputDir] + [self.getResizeDir(name, outputDir) for name, size in self.resizeOutputs]
+
+		for frame, source in sequence.heldFrames(self.frRange, self.frameStep):
+			for directory in dir_ls:
+				src = sequence.framePath(directory, self.outputFile, self.compression, source)
+				dst = sequence.framePath(directory, self.outputFile, self.compression, frame)
+				if os.path.isfile(src):
+					try:
+						sequence.linkFile(src, dst)
+					except (IOError, OSError):
+						self.warning("Could not hold frame %d" %frame)
+
+
+	# ------------------------------------------------------------------------
+	# Verification
+
+	def getManifestFile(self, outputDir=None):
+		""" Return the path to the manifest listing the frames of the image
+			sequence.
+		"""
+		if outputDir is None:
+			outputDir = self.playblastDir
+		return os.path.join(outputDir, '%s.manifest.json' %self.outputFile)
+
+
+	def verifyOutput(self, outputDir=None):
+		""" Check the rendered image sequence for missing, empty, truncated
+			and wrongly sized frames, and write a manifest of the good frames
+			alongside it. Returns True if every frame is good.
+		"""
+		import verify
+
+		if outputDir is None:
+			outputDir = self.playblastDir
+
+		report = verify.verifySequence(outputDir, self.outputFile, self.compression, self.getFrames(), self.res)
+		if report['missing']:
+			self.warning("Missing frames: %s" %sequence.formatFrameList(report['missing']))
+		for frame, problem in sorted(report['bad'].items()):
+			self.warning("Frame %d is %s" %(frame, problem))
+		self.frameSize_dict[outputDir] = dict((frame, size) for frame, size, mtime, crc in report['frames'])
+
+		manifestFile = self.getManifestFile(outputDir)
+		try:
+			verify.writeManifest(manifestFile, self.outputFile, self.compression, report, self.res)
+		except (IOError, OSError):
+			self.warning("Could not write manifest file: %s" %manifestFile)
+
+		return not (report['missing'] or report['bad'])
+
+	# End verification
+	# ------------------------------------------------------------------------
+
+
+	# ------------------------------------------------------------------------
+	# Extra output resolutions
+
+	def getResizeDir(self, name, outputDir=None):
+		""" Return the directory for the named extra output resolution, which
+			is a subdirectory of the output directory.
+		"""
+		if outputDir is None:
+			outputDir = self.playblastDir
+		return os.path.join(outputDir, name)
+
+
+	def resizeFrames(self, frame_ls, outputDir=None):
+		""" Write downsampled copies of rendered frames for each of the extra
+			output resolutions. The frames are resized in a pool of worker
+			threads rather than captured again.
+		"""
+		import resize
+
+		if outputDir is None:
+			outputDir = self.playblastDir
+
+		item_ls = []
+		for name, size in self.resizeOutputs:
+			resizeDir = self.getResizeDir(name, outputDir)
+			for frame in frame_ls:
+				src = sequence.framePath(outputDir, self.outputFile, self.compression, frame)
+				dst = sequence.framePath(resizeDir, self.outputFile, self.compression, frame)
+				item_ls.append((src, dst, size))
+
+		failed = resize.Resizer().process(item_ls)
+		if failed:
+			self.warning("Could not resize %d frames." %failed)
+		for name, size in self.resizeOutputs:
+			print("%s output (%dx%d): %s" %(name.capitalize(), size[0], size[1], sequence.sequencePath(self.getResizeDir(name, outputDir), self.outputFile, self.compression)))
+
+	# End extra output resolutions
+	# ------------------------------------------------------------------------
+
+
+	# ------------------------------------------------------------------------
+	# Incremental playblasts
+
+	def getFingerprintFile(self):
+		""" Return the path to the file storing the per-frame fingerprints
+			of the last playblast.
+		"""
+		return os.path.join(self.playblastDir, '.%s.fingerprints.json' %self.outputFile)
+
+
+	def getInputCurves(self):
+		""" Return a sorted list of the animation curves driving the camera
+			and the visible geometry, including the curves on their parents.
+		"""
+		node_ls = mc.ls(self.camera, long=True) or []
+		node_ls += mc.listRelatives(self.camera, shapes=True, fullPath=True) or []
+		node_ls += mc.ls(type=('mesh', 'nurbsSurface', 'subdiv'), visible=True, noIntermediate=True, long=True) or []
+
+		# Add ancestors by walking up the long DAG paths
+		dag_set = set()
+		for node in node_ls:
+			path = node.split('|')
+			for i in range(2, len(path)+1):
+				dag_set.add('|'.join(path[:i]))
+
+		if not dag_set:
+			return []
+		history_ls = mc.listHistory(list(dag_set)) or []
+		return sorted(set(mc.ls(history_ls, type='animCurve') or []))
+
+
+	def getFingerprints(self):
+		""" Return a dictionary mapping each frame to be playblasted to a
+			fingerprint of the inputs affecting its appearance: the evaluated
+			values of the animation curves driving the camera and visible
+			geometry, plus the playblast options.
+		"""
+		curve_ls = self.getInputCurves()
+		options = [self.formatName, self.camera, self.res, self.noSelect, self.guides, self.burnin, self.viewportProfile, curve_ls]
+		base = hashlib.md5(json.dumps(options).encode('utf-8'))
+
+		fingerprint_dict = {}
+		for frame in self.getFrames():
+			value_ls = []
+			if curve_ls:
+				value_ls = mc.keyframe(curve_ls, query=True, eval=True, time=(frame, frame)) or []
+			fingerprint = base.copy()
+			fingerprint.update(repr([round(value, 6) for value in value_ls]).encode('utf-8'))
+			fingerprint_dict[frame] = fingerprint.hexdigest()
+
+		return fingerprint_dict
+
+
+	def getDirtyFrames(self):
+		""" Return a list of the frames whose fingerprint has changed since
+			the last playblast, or which are missing or incomplete.
+		"""
+		self.fingerprint_dict = self.getFingerprints()
+		try:
+			with open(self.getFingerprintFile(), 'r') as f:
+				stored_dict = json.load(f)
+		except (IOError, OSError, ValueError):
+			stored_dict = {}
+
+		dirty_set = set(self.getMissingFrames())
+		for frame, fingerprint in self.fingerprint_dict.items():
+			if stored_dict.get(str(frame)) != fingerprint:
+				dirty_set.add(frame)
+
+		print("%d of %d frames need updating." %(len(dirty_set), len(self.fingerprint_dict)))
+		return sorted(dirty_set)
+
+
+	def storeFingerprints(self, frame_ls):
+		""" Update the stored fingerprints for the given list of frames,
+			which have been rendered successfully. Frames held by the frame
+			step shouldn't be included, as they don't show their own content.
+		"""
+		fingerprintFile = self.getFingerprintFile()
+		try:
+			with open(fingerprintFile, 'r') as f:
+				stored_dict = json.load(f)
+		except (IOError, OSError, ValueError):
+			stored_dict = {}
+
+		for frame in frame_ls:
+			stored_dict[str(frame)] = self.fingerprint_dict[frame]
+
+		try:
+			with open(fingerprintFile, 'w') as f:
+				json.dump(stored_dict, f, indent=4, sort_keys=True)
+		except (IOError, OSError):
+			self.warning("Could not write fingerprint file: %s" %fingerprintFile)
+
+	# End incremental playblasts
+	# ------------------------------------------------------------------------
+
+
+	# ------------------------------------------------------------------------
+	# Parallel playblasts
+
+	def getWorkerScene(self):
+		""" Return a tuple containing the path to a scene file that worker
+			processes can open, and whether the file is a temporary copy.
+			If the current scene is untitled or has unsaved changes, a
+			temporary copy is exported so the workers see the same state as
+			the artist.
+		"""
+		scene = mc.file(q=True, sceneName=True)
+		if scene and not mc.file(q=True, modified=True):
+			return scene, False
+
+		tmpScene = os.path.join(tempfile.mkdtemp(prefix='preview_'), 'preview_tmp.ma')
+		mc.file(tmpScene, exportAll=True, preserveReferences=True, type='mayaAscii', force=True)
+		return tmpScene, True
+
+
+	def getWorkerOptions(self, outputDir, frame_ls):
+		""" Return the keyword arguments needed to recreate this preview for
+			the given output directory and list of frames in a worker process.
+			Frames skipped by the frame step are held by the parent process
+			once all the workers have finished.
+		"""
+		return dict(outputDir=outputDir, 
+		            outputFile=self.outputFile, 
+		            outputFormat=self.formatName, 
+		            activeView=None, 
+		            camera=self.camera, 
+		            res=self.res, 
+		            frRange=(frame_ls[0], frame_ls[-1]), 
+		            frameList=frame_ls, 
+		            offscreen=True, 
+		            noSelect=self.noSelect, 
+		            guides=self.guides, 
+		            burnin=self.burnin, 
+		            burninMode='post', 
+		            interruptible=False, 
+		            headless=True, 
+		            verify=False, 
+		            memoryLimit=self.memoryLimit, 
+		            viewportProfile=self.viewportProfile)
+
+
+	def mergeChunk(self, chunkDir):
+		""" Move the frames rendered by a worker into the output directory.
+		"""
+		for filename in os.listdir(chunkDir):
+			dst = os.path.join(self.playblastDir, filename)
+			if os.path.isfile(dst):
+				os.remove(dst)
+			os.rename(os.path.join(chunkDir, filename), dst)
+		shutil.rmtree(chunkDir, ignore_errors=True)
+
+
+	def playblastParallel(self):
+		""" Split the frame range into chunks and render them concurrently in
+			a pool of headless mayapy worker processes, then merge the results
+			into a single image sequence in the output directory.
+		"""
+		import previewWorker
+
+		if not os.path.isdir(self.playblastDir):
+			os.makedirs(self.playblastDir)
+
+		output = sequence.sequencePath(self.playblastDir, self.outputFile, self.compression)
+
+		# Divide the frames between the workers. When resuming or
+		# re-blasting incrementally, only the frames needing updating are
+		# shared out
+		frame_ls = self.getFramesToRender()
+		if not frame_ls:
+			print("All frames are up to date. Nothing to playblast.")
+			if self.frameStep > 1:
+				self.holdFrames()
+			return self.createResult("Completed", output)
+		chunk_ls = sequence.splitFrames(frame_ls, self.processes)
+		self.frameTimer = timing.FrameTimer()
+		self.frameTimer.start()
+
+		scene, tmpScene = self.getWorkerScene()
+		self.stageTimer.start('capture')
+
+		# Launch workers - each one renders into its own hidden directory so
+		# a failed chunk can't leave partial frames in the output directory
+		worker_ls = []
+		for i, chunk in enumerate(chunk_ls):
+			chunkDir = os.path.join(self.playblastDir, '.chunk%03d' %i)
+			job = {'scene': scene, 'preview': self.getWorkerOptions(chunkDir, chunk)}
+			print("Playblasting frames %s in worker process %d" %(sequence.formatFrameList(chunk), i))
+			worker_ls.append((chunkDir, chunk, previewWorker.WorkerProcess(job, frames=len(chunk))))
+
+		# Report the frames captured by all the workers until they finish,
+		# stopping them if the playblast is cancelled
+		self.framesDone = 0
+		self.framesTotal = len(frame_ls)
+		while True:
+			finished = all([worker.finished() for chunkDir, chunk, worker in worker_ls])
+			self.reportChunk(sum([worker.framesDone for chunkDir, chunk, worker in worker_ls]) - self.framesDone)
+			if finished:
+				break
+			if self.cancelled:
+				for chunkDir, chunk, worker in worker_ls:
+					worker.terminate()
+				break
+			time.sleep(WORKER_POLL_INTERVAL)
+
+		# Wait for workers to finish and gather results. The frames from a
+		# worker stopped by cancelling are discarded.
+		completed_ls = []
+		failed_ls = []
+		for chunkDir, chunk, worker in worker_ls:
+			result = worker.wait()
+			if result and result.get('timingReport'):
+				for frame, seconds in result['timingReport']['frame_times']:
+					self.frameTimer.add(frame, seconds)
+			if result and result['status'] == "Completed":
+				self.mergeChunk(chunkDir)
+				completed_ls += chunk
+			elif self.cancelled:
+				shutil.rmtree(chunkDir, ignore_errors=True)
+			else:
+				if result:
+					failed_ls.append(result['message'])
+				else:
+					failed_ls.append("\n".join(worker.log[-10:]))
+				shutil.rmtree(chunkDir, ignore_errors=True)
+
+		self.stageTimer.start('post')
+		if tmpScene:
+			shutil.rmtree(os.path.dirname(scene), ignore_errors=True)
+		if self.resizeOutputs:
+			self.resizeFrames(completed_ls)
+		if self.frameStep > 1:
+			self.holdFrames()
+		if self.incremental:
+			self.storeFingerprints(completed_ls)
+		self.writeTimingReport()
+		verified = not self.verify or self.verifyOutput()
+
+		if self.cancelled:
+			print("Playblast cancelled after %d of %d frames." %(len(completed_ls), len(frame_ls)))
+		elif not failed_ls and verified:
+			return self.createResult("Completed", output, frame_ls=completed_ls)
+		for msg in failed_ls:
+			self.warning("Playblast worker failed: %s" %msg)
+		if self.interruptible or self.cancelled:
+			return self.createResult("Interrupted", output, frame_ls=completed_ls)
+		elif failed_ls:
+			return self.createResult("Failed", message="%d of %d playblast workers failed." %(len(failed_ls), len(worker_ls)))
+		else:
+			return self.createResult("Failed", message="Playblast output failed verification. Some frames are missing or damaged.")
+
+	# End parallel playblasts
+	# ------------------------------------------------------------------------
+
+
+	# ------------------------------------------------------------------------
+	# Background playblasts
+
+	def getBackgroundOptions(self):
+		""" Return the keyword arguments needed to recreate this preview in
+			a background worker process. The worker writes straight to the
+			output directory and does all of the post-processing itself.
+		"""
+		options = self.getWorkerOptions(self.playblastDir, self.getFrames())
+		options.update(frRange=self.frRange, 
+		               frameList=self.frameList, 
+		               frameStep=self.frameStep, 
+		               burninMode=self.burninMode, 
+		               resume=self.resume, 
+		               incremental=self.incremental, 
+		               resizeOutputs=self.resizeOutputs, 
+		               verify=self.verify)
+		return options
+
+
+	def playblastBackground(self):
+		""" Start the playblast in a headless mayapy worker process and
+			return immediately. The scene is exported to a temporary file
+			first if it has unsaved changes. Returns a "Started" result, whose
+			'worker' is the previewWorker.WorkerProcess to poll for progress
+			and the result.
+		"""
+		import previewWorker
+
+		if not os.path.isdir(self.playblastDir):
+			os.makedirs(self.playblastDir)
+
+		if self.outputFormat == 'image':
+			output = sequence.sequencePath(self.playblastDir, self.outputFile, self.compression)
+		else:
+			output = os.path.join(self.playblastDir, self.outputFile)
+
+		scene, tmpScene = self.getWorkerScene()
+		job = {'scene': scene, 'preview': self.getBackgroundOptions()}
+		frame_ls = self.getFrames()
+		print("Playblasting frames %s in the background" %sequence.formatFrameList(frame_ls))
+		worker = previewWorker.WorkerProcess(job, 
+			tmpDir=os.path.dirname(scene) if tmpScene else None, 
+			frames=len(frame_ls))
+		result = self.createResult("Started", output)
+		result.worker = worker
+		return result
+
+	# End background playblasts
+	# ------------------------------------------------------------------------
+
+
+	def run_playblast(self, frRange=None, outputDir=None, frames=None):
 		""" Maya command to generate playblast.
+			'frRange' and 'outputDir' override the frame range and directory
+			to render to, if specified. 'frames' renders a list of individual
+			frames instead of a range.
 		"""
+		if frRange is None:
+			frRange = self.frRange
+		if outputDir is None:
+			outputDir = self.playblastDir
+
 		pb_args = {}
-		pb_args['filename'] = '%s/%s' %(self.playblastDir, self.outputFile)
-		pb_args['startTime'] = self.frRange[0]
-		pb_args['endTime'] = self.frRange[1]
+		pb_args['filename'] = '%s/%s' %(outputDir, self.outputFile)
+		if frames:
+			pb_args['frame'] = frames
+		else:
+			pb_args['startTime'] = frRange[0]
+			pb_args['endTime'] = frRange[1]
 		pb_args['framePadding'] = 4
 		pb_args['width'] = self.res[0]
 		pb_args['height'] = self.res[1]
 		pb_args['percent'] = 100
-		pb_args['format'] = self.outputFormat
+		if self.outputFormat == 'ffmpeg':  # Capture images to pipe to encoder
+			pb_args['format'] = 'image'
+		else:
+			pb_args['format'] = self.outputFormat
 		pb_args['compression'] = self.compression
-		if self.sound:
+		if self.sound and self.outputFormat == 'qt':
 			pb_args['sound'] = self.sound
 		pb_args['viewer'] = False
 		pb_args['offScreen'] = self.offscreen
 		pb_args['clearCache'] = True
 		pb_args['showOrnaments'] = True
-		pb_args['editorPanelName'] = self.activeView
+		if self.activeView:
+			pb_args['editorPanelName'] = self.activeView
 
-		return mc.playblast(**pb_args)
+		if frames:
+			self.captureFrames = set(int(frame) for frame in frames)
+		else:
+			self.captureFrames = set(range(int(frRange[0]), int(frRange[1])+1))
+		try:
+			output = mc.playblast(**pb_args)
+		finally:
+			self.captureFrames = None
+		if self.frameTimer:
+			self.frameTimer.flush()  # End timing of the last frame
+		return output
 
 # ----------------------------------------------------------------------------
 # End of main class
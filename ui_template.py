@@ -24,6 +24,7 @@ import ui_chrome_rc  # Import resource file as generated by pyside-rcc
 
 # Import custom modules
 #import oswrapper
+import environment
 
 
 # ----------------------------------------------------------------------------
@@ -34,31 +35,6 @@ import ui_chrome_rc  # Import resource file as generated by pyside-rcc
 VENDOR = "UNIT"
 
 
-# ----------------------------------------------------------------------------
-# Environment detection
-# ----------------------------------------------------------------------------
-
-ENVIRONMENT = os.environ.get('IC_ENV', "STANDALONE")
-
-try:
-	import maya.cmds as mc
-	ENVIRONMENT = "MAYA"
-except ImportError:
-	pass
-
-try:
-	import hou
-	ENVIRONMENT = "HOUDINI"
-except ImportError:
-	pass
-
-try:
-	import nuke
-	import nukescripts
-	ENVIRONMENT = "NUKE"
-except ImportError:
-	pass
-
 # ----------------------------------------------------------------------------
 # Settings data class
 # ----------------------------------------------------------------------------
@@ -159,7 +135,7 @@ class TemplateUI(object):
 		if self.store_window_geometry:
 
 			# Use QSettings to store window geometry and state.
-			if ENVIRONMENT == 'STANDALONE':
+			if environment.getEnvironment() == 'STANDALONE':
 				print("Restoring window geometry for '%s'." %self.objectName())
 				try:
 					self.settings = QtCore.QSettings(VENDOR, window_title)
@@ -170,10 +146,10 @@ class TemplateUI(object):
 			# Makes Maya perform magic which makes the window stay on top in
 			# OS X and Linux. As an added bonus, it'll make Maya remember the
 			# window position.
-			elif ENVIRONMENT == 'MAYA':
+			elif environment.getEnvironment() == 'MAYA':
 				self.setProperty("saveWindowPref", True)
 
-			elif ENVIRONMENT == 'NUKE':
+			elif environment.getEnvironment() == 'NUKE':
 				pass
 
 		# Set up keyboard shortcuts
@@ -194,7 +170,7 @@ class TemplateUI(object):
 		info[__binding__] = __binding_version__
 		info['Qt'] = QtCore.qVersion()
 		info['OS'] = platform.system()
-		info['Environment'] = ENVIRONMENT
+		info['Environment'] = environment.getEnvironment()
 
 		return info
 
@@ -781,7 +757,7 @@ class TemplateUI(object):
 	def storeWindow(self):
 		""" Store window geometry.
 		"""
-		if ENVIRONMENT == 'STANDALONE':
+		if environment.getEnvironment() == 'STANDALONE':
 			if self.store_window_geometry:
 				print("Storing window geometry for '%s'." %self.objectName())
 				try:
@@ -854,6 +830,8 @@ def _maya_main_window():
 def _maya_delete_ui(window_object, window_title):
 	""" Delete existing UI in Maya.
 	"""
+	import maya.cmds as mc
+
 	if mc.window(window_object, query=True, exists=True):
 		mc.deleteUI(window_object)  # Delete window
 	if mc.dockControl('MayaWindow|' + window_title, query=True, exists=True):
@@ -865,12 +843,14 @@ def _maya_delete_ui(window_object, window_title):
 ###########
 
 def _houdini_get_session():
+	import hou
 	return hou.session
 
 
 def _houdini_main_window():
 	""" Return Houdini's main window.
 	"""
+	import hou
 	return hou.qt.mainWindow()
 	raise RuntimeError("Could not find Houdini's main window instance")
 
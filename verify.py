@@ -0,0 +1,193 @@
+#!/usr/bin/python
+
+# verify.py
+#
+# Mike Bonnington <mjbonnington@gmail.com>
+# (c) 2019
+#
+# Image sequence verifier for u-preview.
+# Checks a rendered sequence for missing, empty and truncated frames and for
+# frames of the wrong size, and writes a manifest listing each frame's size,
+# modification time and checksum, so downstream tools don't need to list a
+# large directory again. This module has no application-specific
+# dependencies.
+
+
+import json
+import struct
+import zlib
+
+from multiprocessing.pool import ThreadPool
+
+import sequence
+
+
+MANIFEST_VERSION = 1
+READ_SIZE = 1024*1024  # Bytes read at a time when computing checksums
+
+
+# ----------------------------------------------------------------------------
+# Image headers
+# ----------------------------------------------------------------------------
+
+def _jpegSize(f):
+	""" Return the size of a JPEG image by finding its start of frame marker.
+	"""
+	if f.read(2) != b'\xff\xd8':
+		return None
+	while True:
+		marker = f.read(2)
+		if len(marker) < 2 or marker[0:1] != b'\xff':
+			return None
+		code = ord(marker[1:2])
+		if code in (0xd8, 0x01) or 0xd0 <= code <= 0xd7:  # No length
+			continue
+		length = struct.unpack('>H', f.read(2))[0]
+		if 0xc0 <= code <= 0xcf and code not in (0xc4, 0xc8, 0xcc):  # SOFn
+			height, width = struct.unpack('>xHH', f.read(5))
+			return width, height
+		f.seek(length-2, 1)
+
+
+def _pngSize(f):
+	""" Return the size of a PNG image from its IHDR chunk.
+	"""
+	header = f.read(24)
+	if len(header) < 24 or header[12:16] != b'IHDR':
+		return None
+	return struct.unpack('>II', header[16:24])
+
+
+def _tiffSize(f):
+	""" Return the size of a TIFF image from the tags of its first IFD.
+	"""
+	order = f.read(2)
+	if order == b'II':
+		endian = '<'
+	elif order == b'MM':
+		endian = '>'
+	else:
+		return None
+	magic, offset = struct.unpack(endian+'HI', f.read(6))
+	if magic != 42:
+		return None
+	f.seek(offset)
+	count = struct.unpack(endian+'H', f.read(2))[0]
+	size = {}
+	for i in range(count):
+		tag, fieldType, n, value = struct.unpack(endian+'HHI4s', f.read(12))
+		if tag in (256, 257):  # ImageWidth, ImageLength
+			if fieldType == 3:  # SHORT
+				size[tag] = struct.unpack(endian+'H', value[:2])[0]
+			else:  # LONG
+				size[tag] = struct.unpack(endian+'I', value)[0]
+	if 256 in size and 257 in size:
+		return size[256], size[257]
+	return None
+
+
+HEADER_READERS = {
+	'jpg': _jpegSize,
+	'jpeg': _jpegSize,
+	'png': _pngSize,
+	'tif': _tiffSize,
+	'tiff': _tiffSize,
+}
+
+
+def imageSize(path, ext):
+	""" Return the dimensions (width, height) of an image file, read from
+		its header, or None if they can't be determined.
+	"""
+	reader = HEADER_READERS.get(ext.lower())
+	if reader is None:
+		return None
+	try:
+		with open(path, 'rb') as f:
+			return reader(f)
+	except (IOError, OSError, struct.error):
+		return None
+
+
+def checksum(path):
+	""" Return the CRC-32 checksum of a file as a hexadecimal string.
+	"""
+	crc = 0
+	with open(path, 'rb') as f:
+		while True:
+			data = f.read(READ_SIZE)
+			if not data:
+				break
+			crc = zlib.crc32(data, crc)
+	return '%08x' %(crc & 0xffffffff)
+
+
+# ----------------------------------------------------------------------------
+# Verification
+# ----------------------------------------------------------------------------
+
+def _checkFrame(item):
+	""" Check a single frame. Returns a tuple (frame, size, mtime, checksum,
+		problem), where 'problem' is None if the frame is good.
+	"""
+	frame, path, size, mtime, ext, res = item
+	if size == 0:
+		return frame, size, mtime, None, 'empty'
+	try:
+		if not sequence.isComplete(path, ext, size):
+			return frame, size, mtime, None, 'truncated'
+		if res:
+			dimensions = imageSize(path, ext)
+			if dimensions is not None and tuple(dimensions) != tuple(res):
+				return frame, size, mtime, None, 'wrong size %dx%d' %tuple(dimensions)
+		return frame, size, mtime, checksum(path), None
+	except (IOError, OSError):
+		return frame, size, mtime, None, 'unreadable'
+
+
+def verifySequence(directory, name, ext, frames, res=None, threads=8):
+	""" Verify the given frames of an image sequence. The directory is
+		listed once, then the files are checked in a pool of threads. Returns
+		a dictionary with a list of the missing frames, a dictionary mapping
+		each bad frame to a description of the problem, and a list of
+		(frame, size, mtime, checksum) tuples for the good frames.
+	"""
+	frame_dict = sequence.scanSequence(directory, name, ext)
+
+	missing_ls = []
+	item_ls = []
+	for frame in frames:
+		try:
+			path, size, mtime = frame_dict[frame]
+		except KeyError:
+			missing_ls.append(frame)
+		else:
+			item_ls.append((frame, path, size, mtime, ext, res))
+
+	pool = ThreadPool(threads)
+	try:
+		result_ls = pool.map(_checkFrame, item_ls)
+	finally:
+		pool.close()
+		pool.join()
+
+	report = {}
+	report['missing'] = missing_ls
+	report['bad'] = dict((frame, problem) for frame, size, mtime, crc, problem in result_ls if problem)
+	report['frames'] = [(frame, size, mtime, crc) for frame, size, mtime, crc, problem in result_ls if not problem]
+	return report
+
+
+def writeManifest(path, name, ext, report, res=None, padding=4):
+	""" Write a manifest of the good frames in a verified sequence to a JSON
+		file. Each frame is listed as [frame, size, mtime, checksum].
+	"""
+	manifest = {}
+	manifest['version'] = MANIFEST_VERSION
+	manifest['name'] = name
+	manifest['ext'] = ext
+	manifest['padding'] = padding
+	manifest['res'] = res
+	manifest['frames'] = report['frames']
+	with open(path, 'w') as f:
+		json.dump(manifest, f, separators=(',', ':'))